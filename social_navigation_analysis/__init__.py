@@ -1,3 +1,15 @@
-import utils
-import info
-import preprocess
\ No newline at end of file
+# submodules are imported on first access (eg social_navigation_analysis.preprocess), 
+# so importing the package itself is fast
+import importlib
+
+__all__ = ['utils', 'info', 'preprocess']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
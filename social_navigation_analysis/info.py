@@ -1,6 +1,8 @@
-import pandas as pd 
-from pathlib import Path 
-import openpyxl
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from functools import lru_cache
+import hashlib, json, fnmatch, re, os, uuid
 
 pkg_dir = str(Path(__file__).parent.absolute())
 data_dir = str(Path(f'{pkg_dir}/../data'))
@@ -9,36 +11,212 @@ example_org_file = str(Path(f'{data_dir}/example_files/snt_18001.xlsx'))
 example_beh_file = str(Path(f'{data_dir}/example_files/snt_18001_behavior.xlsx'))
 
 # decision info:
-try: 
+# the tables below are read on first access (eg info.task), not on import
+# - each xlsx is read through a parquet copy next to it, rebuilt when the xlsx changes
+dtype_dict = {'decision_num': int,
+              'scene_num': int,
+              'char_role_num': int,
+              'char_decision_num': int,
+              'cogent_onset': float}
 
+
+def _file_hash(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _replace_file(file_path, write):
+    ''' write(path) to a temp file next to file_path, then move it into place: other processes never see a half-written file '''
+    tmp_path = Path(file_path).with_name(f'.{Path(file_path).name}.{uuid.uuid4().hex}.tmp')
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists(): tmp_path.unlink()
+
+
+def _write_json(obj, file_path):
+    with open(file_path, 'w') as f: json.dump(obj, f)
+
+
+def read_xlsx_cached(xlsx_fname):
+    '''
+        Read an xlsx, via a parquet copy (& a .json w/ the xlsx's mtime, size & hash) next to it
+        The copy is rebuilt when the xlsx's mtime or size change & its hash no longer matches
+        Both are replaced atomically, the parquet first, so a .json always describes a complete parquet 
+        (eg when parallel workers rebuild the copy at once)
+    '''
+    xlsx_path  = Path(xlsx_fname)
+    cache_path = xlsx_path.with_suffix('.parquet')
+    meta_path  = Path(f'{cache_path}.json')
+    if not xlsx_path.exists(): raise Exception(f"Can't find {xlsx_path.name} in {xlsx_path.parent}")
+
+    stat = xlsx_path.stat()
+    meta = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': None}
+    try:
+        with open(meta_path, 'r') as f:
+            cached_meta = json.load(f)
+        if cache_path.exists():
+            if (cached_meta['mtime'] == meta['mtime']) & (cached_meta['size'] == meta['size']):
+                return pd.read_parquet(cache_path)
+            meta['sha256'] = _file_hash(xlsx_path)
+            if cached_meta['sha256'] == meta['sha256']: # touched but not changed
+                _replace_file(meta_path, lambda path: _write_json(meta, path))
+                return pd.read_parquet(cache_path)
+    except Exception: # no (readable) copy yet
+        pass
+
+    df = pd.read_excel(xlsx_path)
+    try:
+        if meta['sha256'] is None: meta['sha256'] = _file_hash(xlsx_path)
+        _replace_file(cache_path, lambda path: df.to_parquet(path, index=False))
+        _replace_file(meta_path, lambda path: _write_json(meta, path))
+    except Exception: # eg a read-only install: just use the xlsx
+        pass
+    return df
+
+
+def _load_task():
     # standard details file
-    task = pd.read_excel(str(Path(f'{data_dir}/snt_details.xlsx')))
+    task = read_xlsx_cached(f'{data_dir}/snt_details.xlsx')
     task.sort_values(by='cogent_onset', inplace=True)
-    decision_trials = task[task['trial_type'] == 'Decision']
-    dtype_dict = {'decision_num': int,
-                    'scene_num': int,
-                    'char_role_num': int,
-                    'char_decision_num': int,
-                    'cogent_onset': float}
+    return task
+
+
+def _load_decision_trials():
+    decision_trials = _get('task')
+    decision_trials = decision_trials[decision_trials['trial_type'] == 'Decision']
     decision_trials = decision_trials.astype(dtype_dict) # ensure correct dtypes
     decision_trials.reset_index(inplace=True, drop=True)
+    return decision_trials
+
+
+# validated decisions, w/ alphabetically sorted options - for parsing online data w/ randomized options
+def _load_sorted_options(fname):
+    options = read_xlsx_cached(f'{data_dir}/{fname}')
+    return options.sort_values(by = 'decision_num').reset_index(drop=True)
+
+
+# output schema: the data dictionary's variables are patterns ('*' wildcards) w/ a dtype
+# - a column takes the dtype of the first variable it matches
+def _load_output_schema():
+    dictionary = _get('data_dictionary')
+    return [(re.compile(fnmatch.translate(v)), d) for v, d in zip(dictionary['variable'], dictionary['dtype'])]
+
 
+def _load_validated_decisions():
+    return {'standard': _get('standard'), 'schema': _get('schema'), 'adolescent': _get('adolescent')}
 
-    # validated decisions, w/ alphabetically sorted options - for parsing online data w/ randomized options
-    standard = pd.read_excel(str(Path(f'{data_dir}/snt_sorted-options_standard_mem50_n81.xlsx')))
-    standard = standard.sort_values(by = 'decision_num').reset_index(drop=True)
 
-    schema = pd.read_excel(str(Path(f'{data_dir}/snt_sorted-options_schema.xlsx')))
-    schema = schema.sort_values(by = 'decision_num').reset_index(drop=True)
+_loaders = {'task': _load_task,
+            'decision_trials': _load_decision_trials,
+            'standard': lambda: _load_sorted_options('snt_sorted-options_standard_mem50_n81.xlsx'),
+            'schema': lambda: _load_sorted_options('snt_sorted-options_schema.xlsx'),
+            'adolescent': lambda: _load_sorted_options('snt_sorted-options_adolescent.xlsx'),
+            'validated_decisions': _load_validated_decisions,
+            'data_dictionary': lambda: read_xlsx_cached(f'{data_dir}/snt_data_dictionary.xlsx'),
+            'output_schema': _load_output_schema}
 
-    adolescent = pd.read_excel(str(Path(f'{data_dir}/snt_sorted-options_adolescent.xlsx')))
-    adolescent = adolescent.sort_values(by = 'decision_num').reset_index(drop=True)
 
-    validated_decisions = {'standard': standard, 'schema': schema, 'adolescent': adolescent}
+def _get(name):
+    return globals()[name] if name in globals() else __getattr__(name)
 
-except: 
 
-    raise Exception(f"Can't find some files in {pkg_dir}")
+def __getattr__(name):
+    ''' load a table on first access, then keep it as a regular module attribute '''
+    if name not in _loaders:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = _loaders[name]()
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_loaders))
+
 
 # defaults
-character_roles  = ['first', 'second', 'assistant', 'powerful', 'boss', 'neutral'] # in order of role num in snt_details
\ No newline at end of file
+character_roles  = ['first', 'second', 'assistant', 'powerful', 'boss', 'neutral'] # in order of role num in snt_details
+
+
+#------------------------------------------------------------------------------------------
+# output dtypes
+#------------------------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=None)
+def schema_dtype(column):
+    ''' the data dictionary's dtype for a column, or None if it is not in the dictionary '''
+    for regex, dtype in _get('output_schema'):
+        if regex.match(column): return dtype
+    return None
+
+
+def _check_values(values, dtype):
+    ''' the values as dtype & what is wrong w/ them, if anything '''
+    if dtype is None:                   return None, 'not in the data dictionary'
+    if dtype == 'object':               return None, None
+    if dtype == 'category':             return values.astype('category'), None
+    if dtype == 'bool':
+        if values.dtype == bool:        return None, None
+        if values.isin([True, False]).all(): return values.astype(bool), None
+        return None, 'has non-boolean values'
+
+    numeric = pd.to_numeric(values, errors='coerce') if values.dtype == object else values
+    if not pd.api.types.is_numeric_dtype(numeric) or (numeric.isnull().sum() > values.isnull().sum()):
+        return None, 'has non-numeric values'
+    if dtype.startswith('int'):
+        # ints can't hold missing values: keep those as floats
+        if numeric.isnull().any():                return numeric.astype('float32'), None
+        if np.any(numeric != np.round(numeric)):  return numeric.astype('float32'), 'has non-whole numbers'
+        if (numeric.min() < np.iinfo(dtype).min) | (numeric.max() > np.iinfo(dtype).max):
+            return numeric.astype('float32'), f'has values outside the {dtype} range'
+    return numeric.astype(dtype), None
+
+
+def coerce_dtypes(df):
+    '''
+        A copy of an output table w/ the compact dtypes in the data dictionary: categoricals for labels, 
+        int8/int16 for counts & decisions & float32 for metrics
+        - integer columns w/ missing, non-whole or out of range values become float32
+        - columns not in the dictionary or w/ values that don't fit their dtype are left as they are (see validate_table)
+
+        Arguments
+        ---------
+        df : pd.DataFrame
+            Eg the outputs of ParseCsv.run or ComputeBehavior2.run, or their concatenation over participants
+
+        Returns
+        -------
+        pd.DataFrame 
+    '''
+    df = df.copy()
+    for c, column in enumerate(df.columns):
+        values, _ = _check_values(df.iloc[:, c], schema_dtype(column))
+        if values is not None: df.isetitem(c, values)
+    return df
+
+
+def validate_table(df, raise_errors=False):
+    '''
+        Check a table's columns against the data dictionary
+
+        Arguments
+        ---------
+        df : pd.DataFrame
+        raise_errors : bool (optional, default=False)
+            Raise an exception if any column does not match
+
+        Returns
+        -------
+        pd.DataFrame 
+            one row per column that does not match: column, dictionary dtype & problem
+    '''
+    problems = []
+    for c, column in enumerate(df.columns):
+        dtype = schema_dtype(column)
+        _, problem = _check_values(df.iloc[:, c], dtype)
+        if problem is not None: problems.append([column, dtype, problem])
+    problems = pd.DataFrame(problems, columns=['column', 'dtype', 'problem'])
+    if raise_errors & (len(problems) > 0):
+        raise Exception(f'{len(problems)} columns do not match the data dictionary:\n{problems.to_string(index=False)}')
+    return problems
@@ -1,68 +1,228 @@
-import os, sys, glob, warnings, re, math, patsy, csv
+import os, sys, glob, warnings, re, math, csv
 from pathlib import Path
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import scipy as sp 
-import pycircstat
-from PIL import Image
-from sklearn.feature_extraction import image
-from sklearn.cluster import spectral_clustering
 import numpy.lib.recfunctions as rfn
-from scipy.spatial import ConvexHull, Delaunay, procrustes
-from shapely.geometry import Polygon, MultiPoint, mapping
-import alphashape
-import copy, json
+from scipy.spatial import ConvexHull, Delaunay, procrustes, QhullError
+import copy, hashlib, json, mmap, time, traceback
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 from functools import wraps, lru_cache
 from numpy import asarray, linalg
 
 # my own modules
-import info 
-import utils
+try: # as part of the package
+    from . import info, utils
+except ImportError: # as flat modules, eg in the tests
+    import info 
+    import utils
 pkg_dir = str(Path(__file__).parent.absolute())
 
+# the image processing (PIL, sklearn), plotting (matplotlib), shape (shapely, alphashape) 
+# & circular stats (pycircstat) stacks are slow to import: they are imported where they are used
+
+
+#------------------------------------------------------------------------------------------
+# incremental cache
+#------------------------------------------------------------------------------------------
+
+
+# each processing step records what it made in out_dir/.snt_cache: one json per (step, input file)
+# an entry is reused only if the input's content, the step's parameters & the package version all match
+cache_dirname = '.snt_cache'
+
+
+@lru_cache(maxsize=None)
+def get_version():
+    ''' installed package version (or setup.cfg's, if running from the repo) '''
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        return version('social_navigation_analysis')
+    except Exception:
+        import configparser
+        config = configparser.ConfigParser()
+        config.read(Path(f'{pkg_dir}/../setup.cfg'))
+        return config.get('metadata', 'version', fallback='unknown')
+
+
+def file_hash(file_path, chunk_size=2**20):
+    ''' sha256 of a file's contents '''
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _cache_entry_fname(out_dir, step, file_path):
+    input_id = hashlib.sha256(str(Path(file_path).resolve()).encode()).hexdigest()[:16]
+    return Path(f'{out_dir}/{cache_dirname}/{step}_{Path(file_path).stem}_{input_id}.json')
+
+
+def _json_params(params):
+    ''' parameters as json-able values (eg lists stay lists, paths become strings) '''
+    return json.loads(json.dumps(params, default=str))
+
+
+def check_cache(out_dir, step, file_path, params):
+    '''
+        Look up the outputs of a step that already ran on this input w/ these parameters
+
+        Arguments
+        ---------
+        out_dir : str
+            The step's output directory
+        step : str
+            Name of the processing step, eg 'parse_log'
+        file_path : str
+            Input file
+        params : dict
+            The step's parameters that change its outputs
+
+        Returns
+        -------
+        list of str or None
+            The cached output files, or None if the step needs to (re)run
+    '''
+    entry_fname = _cache_entry_fname(out_dir, step, file_path)
+    if not os.path.exists(entry_fname): return None
+    with open(entry_fname, 'r') as f:
+        entry = json.load(f)
+    if ((entry['input_hash'] != file_hash(file_path)) or (entry['params'] != _json_params(params))
+        or (entry['version'] != get_version()) or not all(os.path.exists(o) for o in entry['outputs'])):
+        return None
+    return entry['outputs']
+
+
+def update_cache(out_dir, step, file_path, params, outputs):
+    ''' record the outputs of a step that just ran (see check_cache) '''
+    entry_fname = _cache_entry_fname(out_dir, step, file_path)
+    os.makedirs(entry_fname.parent, exist_ok=True)
+    entry = {'step': step, 'input': str(Path(file_path).resolve()), 'input_hash': file_hash(file_path),
+             'params': _json_params(params), 'version': get_version(),
+             'outputs': [str(o) for o in outputs], 'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+    with open(entry_fname, 'w') as f:
+        json.dump(entry, f, indent=2)
+
+
+def list_cache(out_dir):
+    '''
+        List the cache entries under a directory (searched recursively, eg a whole project's outputs)
+
+        Arguments
+        ---------
+        out_dir : str
+
+        Returns
+        -------
+        pd.DataFrame
+            one row per entry: step, input, params, version, outputs, created, entry file,
+            & whether it is stale & why ('input missing', 'input changed', 'version changed' or 'output missing')
+    '''
+    columns = ['step', 'input', 'params', 'version', 'outputs', 'created', 'entry', 'stale', 'reason']
+    version, rows = get_version(), []
+    for entry_fname in sorted(glob.glob(f'{out_dir}/**/{cache_dirname}/*.json', recursive=True)):
+        with open(entry_fname, 'r') as f:
+            entry = json.load(f)
+        if not os.path.exists(entry['input']):               reason = 'input missing'
+        elif file_hash(entry['input']) != entry['input_hash']: reason = 'input changed'
+        elif entry['version'] != version:                       reason = 'version changed'
+        elif not all(os.path.exists(o) for o in entry['outputs']): reason = 'output missing'
+        else:                                                   reason = None
+        rows.append([entry['step'], entry['input'], entry['params'], entry['version'], entry['outputs'],
+                     entry['created'], entry_fname, reason is not None, reason])
+    return pd.DataFrame(rows, columns=columns)
+
+
+def evict_cache(out_dir, stale_only=True, steps=None, remove_outputs=False):
+    '''
+        Remove cache entries so their steps rerun
+
+        Arguments
+        ---------
+        out_dir : str
+            Searched recursively (see list_cache)
+        stale_only : bool (optional, default=True)
+            If False, evict every entry
+        steps : list of str (optional, default=None)
+            Only evict entries from these steps, eg ['compute_behavior']
+        remove_outputs : bool (optional, default=False)
+            Also delete the entries' output files
+
+        Returns
+        -------
+        pd.DataFrame
+            The evicted entries (see list_cache)
+    '''
+    entries = list_cache(out_dir)
+    if stale_only:        entries = entries[entries['stale']]
+    if steps is not None: entries = entries[entries['step'].isin(steps)]
+    for _, entry in entries.iterrows():
+        os.remove(entry['entry'])
+        if remove_outputs:
+            for output in entry['outputs']:
+                if os.path.exists(output): os.remove(output)
+    return entries.reset_index(drop=True)
+
 
 #------------------------------------------------------------------------------------------
 # parse snt logs, txts & csvs
 #------------------------------------------------------------------------------------------
 
 # - txts
-def format_txt_as_csv(txt_file, out_dir):
+def _csv_value(value):
+    ''' a value as pd.read_csv would read it back from a csv: numbers as numbers, empty as nan '''
+    if not isinstance(value, str): return value
+    if value == '': return np.nan
+    for type_ in [int, float]:
+        try: return type_(value)
+        except ValueError: pass
+    return {'True': True, 'False': False}.get(value, value)
+
 
-    ''' for converting the VTech txt files into csv files that CsvParser will recognize'''
+def read_vtech_txt(txt_file):
+    '''
+        Map a VTech txt (json) into the record ParseCsv works on, in memory
+        eg parser = ParseCsv(txt_file, data=read_vtech_txt(txt_file))
+
+        Arguments
+        ---------
+        txt_file : str
+            Path to the txt; the date is taken from its name (eg 'x.x.20220101T...')
+
+        Returns
+        -------
+        pd.DataFrame
+            one row, w/ the columns & values of the csv format_txt_as_csv writes, as if read back from it
+    '''
 
     with open(txt_file) as f:
-        data = json.load(f)
-        exp_data = data['metadata']['social_task_data']
+        exp_data = json.load(f)['metadata']['social_task_data']
 
-    task_df = pd.DataFrame()
-    task_df.loc[0, 'prolific_id'] = [exp_data['prolific_pid']]
-    date = txt_file.split('/')[-1].split('.')[2].split('T')[0]
-    date = date[0:4] + '/' + date[4:6] + '/' + date[6:]
-    task_df.loc[0, 'date'] = date
+    record = {'prolific_id': exp_data['prolific_pid']}
+    date = Path(txt_file).name.split('.')[2].split('T')[0]
+    record['date'] = date[0:4] + '/' + date[4:6] + '/' + date[6:]
 
     #-----------------
     # task info
     #-----------------
 
-    task_df.loc[0, 'task_ver'] = exp_data['version']
+    record['task_ver'] = exp_data['version']
 
     # button presses
-    bps = exp_data['narrative_resps'].split(',')
-    bps = [utils.remove_nonnumeric(b) for b in bps]
-    task_df['snt_choices'] = str([f'{i+1}:{b}' for i, b in enumerate(bps)])
+    bps = [utils.remove_nonnumeric(b) for b in exp_data['narrative_resps'].split(',')]
+    record['snt_choices'] = str([f'{i+1}:{b}' for i, b in enumerate(bps)])
 
     # options
+    opts = []
     for i, o in enumerate(exp_data['narrative_opts_order'].split('],[')):
         opts_ = o.split('","')
         opt1 = utils.remove_nontext(re.sub('[\\\[\]"]', '', opts_[0]))
         opt2 = utils.remove_nontext(re.sub('[\\\[\]"]', '', opts_[1]))
-        if i == 0: opts = f'"{i+1};{opt1};{opt2}"'
-        else:      opts = f'{opts},"{i+1};{opt1};{opt2}"'
-        
-    task_df.loc[0, 'snt_opts_order'] = opts
-    task_df.loc[0, 'snt_rts'] = exp_data['narrative_rts']
+        opts.append(f'"{i+1};{opt1};{opt2}"')
+    record['snt_opts_order'] = ','.join(opts)
+    record['snt_rts'] = exp_data['narrative_rts']
 
     #-----------------
     #  characters
@@ -74,8 +234,8 @@ def format_txt_as_csv(txt_file, out_dir):
         order = {'Chris':'first','Maya':'second','Kayce':'assistant','Newcomb':'powerful','Hayworth':'boss','Anthony':'neutral'}   
 
     for name, role in order.items(): 
-        task_df.loc[0, f'character_info.{role}.name'] = name
-        task_df.loc[0, f'character_info.{role}.img']  = exp_data['character_imgs'][name]
+        record[f'character_info.{role}.name'] = name
+        record[f'character_info.{role}.img']  = exp_data['character_imgs'][name]
 
     #-----------------
     # memory
@@ -84,92 +244,387 @@ def format_txt_as_csv(txt_file, out_dir):
     ques  = re.sub('[\[\]"]', '', exp_data['memory_quests_order']).split(',')
     resps = re.sub('[\[\]"]', '', exp_data['memory_resps']).split(',')
     rts   = re.sub('[\[\]"]', '', exp_data['memory_rts']).split(',')
-
-    memory = []
-    mem_colnames = []
     for n in range(30):
-        mem_colnames.extend([f'memory.{n+1}.question', f'memory.{n+1}.resp', f'memory.{n+1}.rt'])
-        memory.extend([ques[n], order[resps[n]], rts[n]])
-    memory_df = pd.DataFrame(np.array(memory).reshape(1,-1), columns=mem_colnames)
+        record[f'memory.{n+1}.question'] = ques[n]
+        record[f'memory.{n+1}.resp']     = order[resps[n]]
+        record[f'memory.{n+1}.rt']       = rts[n]
 
     #-----------------
     # dots
     #-----------------
 
-    resps = exp_data['dots_resps'].split('],')
-    dots_colnames = []
-    dots = []
-    for resp in resps:
+    for resp in exp_data['dots_resps'].split('],'):
         resp_ = re.sub('[\[\]"]', '', resp).split(',')
-        name = resp_[0].split(':')[0]
-        dots_colnames.extend([f"dots.{name}.affil", f"dots.{name}.power"])
-        dots.extend([resp_[1].split(':')[1],resp_[2].split(':')[1]])
-    dots_df = pd.DataFrame(np.array(dots).reshape(1,-1), columns=dots_colnames)
+        name  = resp_[0].split(':')[0]
+        record[f'dots.{name}.affil'] = resp_[1].split(':')[1]
+        record[f'dots.{name}.power'] = resp_[2].split(':')[1]
 
     #-------------------
     #  judgments
     #-------------------
 
     judgment_order = exp_data['perception_character_order'] # theres a randomized order 
-    rating_cols    = ['liking', 'competence', 'similarity']
-
-    judgments = []
-    judge_colnames = []
-    for col in rating_cols: 
-
-        resps_ = re.sub('[\[!@#$\]]', '', exp_data[f'{col}_resps']) # remove brackets
-        resps  = [int(r) for r in resps_.split(',')]
-        rts_   = re.sub('[\[!@#$\]]', '', exp_data[f'{col}_rts'])
-        rts    = [int(r) for r in rts_.split(',')]
+    for col in ['liking', 'competence', 'similarity']: 
+        resps = re.sub('[\[!@#$\]]', '', exp_data[f'{col}_resps']).split(',') # remove brackets
+        rts   = re.sub('[\[!@#$\]]', '', exp_data[f'{col}_rts']).split(',')
         for r, name in enumerate(judgment_order): 
-            judge_colnames.extend([f'judgments.{order[name]}.{col}.resp', f'judgments.{order[name]}.{col}.rt'])
-            judgments.extend([resps[r], rts[r]])
-
-    judgment_df = pd.DataFrame(np.array(judgments).reshape(1,-1), columns=judge_colnames)
+            record[f'judgments.{order[name]}.{col}.resp'] = int(resps[r])
+            record[f'judgments.{order[name]}.{col}.rt']   = int(rts[r])
 
     #-----------------
     # emotions
     #-----------------
 
-    emotions = []
-    emot_colnames = []
-    emotion_resps = exp_data['emotion_resps'].split('],[')
-    for r, row in enumerate(emotion_resps):
-        row = re.sub('[\[!@#$"\]]', '', row)
-        resps_ = np.array(row.split(',')).reshape(-2,2).T
-        emotions.extend(resps_[1,:])
-        emot_colnames.extend([f'judgments.{order[judgment_order[r]]}.{j}.resp' for j in resps_[0,:]])
-
-    emotion_df = pd.DataFrame(np.array(emotions).reshape(1,-1), columns=emot_colnames)
+    for r, row in enumerate(exp_data['emotion_resps'].split('],[')):
+        row = re.sub('[\[!@#$"\]]', '', row).split(',')
+        for emotion, resp in zip(row[0::2], row[1::2]):
+            record[f'judgments.{order[judgment_order[r]]}.{emotion}.resp'] = resp
 
     #-----------------
     # iq
     #-----------------
 
-    ques = re.sub('[\[\]"]', '', exp_data['iq_quests']).split(',')
+    ques  = re.sub('[\[\]"]', '', exp_data['iq_quests']).split(',')
     resps = re.sub('[\[\]"]', '', exp_data['iq_resps']).split(',')
-    iq_colnames = []
-    iq_resps = []
     for t in range(len(ques)):
-        iq_colnames.append(f'iq.{ques[t]}.resp')
-        iq_resps.append(resps[t])
-    iq_df = pd.DataFrame(np.array(iq_resps).reshape(1,-1), columns=iq_colnames)
+        record[f'iq.{ques[t]}.resp'] = resps[t]
 
-    #-----------------
-    # combine 
-    #-----------------
+    record['end_questions'] = exp_data['end_questions']
+    return pd.DataFrame({col: [_csv_value(value)] for col, value in record.items()})
 
-    out_fname = f"{out_dir}/SNT_{exp_data['prolific_pid']}.csv"
-    csv_df = pd.concat([task_df, memory_df, dots_df, judgment_df, emotion_df, iq_df], axis=1)
-    csv_df['end_questions'] = exp_data['end_questions']
-    csv_df.to_csv(out_fname, index=False)
-    
+
+def format_txt_as_csv(txt_file, out_dir):
+    ''' for converting the VTech txt files into csv files that CsvParser will recognize (see read_vtech_txt) '''
+    record    = read_vtech_txt(txt_file)
+    out_fname = f"{out_dir}/SNT_{record['prolific_id'].values[0]}.csv"
+    record.to_csv(out_fname, index=False)
     return out_fname
 
 
-def parse_log(file_path, experimenter, output_timing=True, out_dir=None, verbose=False): 
+def iter_vtech_txts(txt_files, snt_version='standard', verbose=0, csv_dir=None):
+    '''
+        Stream VTech txts into parsers, one file at a time & w/o writing csvs (see read_vtech_txt)
+
+        Arguments
+        ---------
+        txt_files : str or iterable of str
+            Directory of '*.txt' files, a txt file, or an iterable of txt file paths (consumed lazily)
+        snt_version : str (optional, default='standard')
+        verbose : int (optional, default=0)
+        csv_dir : str (optional, default=None)
+            If given, also write each txt's csv there, as format_txt_as_csv does
+
+        Yields
+        ------
+        ParseCsv
+            eg: for parser in iter_vtech_txts(txt_dir): snt, post = parser.run()
+    '''
+    if isinstance(txt_files, (str, Path)):
+        txt_files = _list_files(txt_files, '*.txt') if os.path.isdir(txt_files) else [txt_files]
+    for txt_file in txt_files:
+        record = read_vtech_txt(txt_file)
+        if csv_dir is not None:
+            record.to_csv(f"{csv_dir}/SNT_{record['prolific_id'].values[0]}.csv", index=False)
+        yield ParseCsv(txt_file, snt_version=snt_version, verbose=verbose, data=record)
+
+
+# - logs
+def get_log_keys(experimenter):
+    '''
+        key presses differed across iterations of the task: returns [button 1 key, button 2 key], scanner trigger key
+        - these versions had a fixed choice order across subjects
+    '''
+    experimenter = experimenter.lower()
+    if experimenter == 'rt':
+        return ['30','31'], '63' # 1,2
+    elif experimenter in ['af','rr']:
+        return ['28','29'], None
+    elif experimenter in ['nr','cs','kb','ff']:
+        return ['29','30'], '54'
+    else:
+        raise Exception(f'Experimenter {experimenter} not recognized')
+
+
+# event kinds in the log event index
+LOG_KEY, LOG_SLIDE, LOG_OTHER = 0, 1, 2
+log_event_dtype = np.dtype([('log_time', 'int64'), # cogent clock when the row was written
+                            ('time', 'int64'),     # key press time or slide start/end time
+                            ('kind', 'int8'),      # LOG_KEY, LOG_SLIDE or LOG_OTHER
+                            ('key', 'int16'),      # key code (-1 if not a key event)
+                            ('slide', 'U16'),      # slide name, eg 'slide_4' or 'pic_1' (message text for other rows)
+                            ('is_start', 'bool')]) # slide start or key down
+
+# the log rows we need have 4 or 8 tab separated items, for example:
+    # 432843	[1]	:	Key	54	DOWN	at	418280
+    # 384919	[3986]	:	slide_28_end: 384919
+# - matched on the raw bytes, so a log can be scanned straight from a memory map
+_log_row_regex = re.compile(rb'^(\d+)\t\[[^\]\t]*\]\t:\t(?:Key\t(\d+)\t(DOWN|UP)\tat\t(\d+) *|(\S+?)_(start|end): (\d+) *|([^\t\r\n]*))\r?$', re.M)
+_log_run_start = b'COGENT START' # each run (cogent session) in a log starts w/ this row
+
+
+def load_log_events(file_path, keys=None, window=2**24):
+    '''
+        Parse a cogent log into a compact event index, shared by choice & timing extraction
+
+        The log is memory-mapped & scanned in windows of whole lines, so only the event arrays are held in memory
+
+        Arguments
+        ---------
+        file_path : str
+            Path to the log file
+        keys : list of str (optional, default=None)
+            Only keep key events w/ these key codes, eg the buttons from get_log_keys;
+            drops continuous scanner triggers etc. None keeps every key
+        window : int (optional, default=2**24)
+            Bytes of the log parsed at a time
+
+        Returns
+        -------
+        np.array
+            structured array w/ log_event_dtype: one element per log row w/ 4 or 8 items, in log order
     '''
-        Parse social navigation cogent logs & generate excel sheets
+    with _map_log(file_path) as log:
+        return _scan_log(log, 0, len(log), keys=keys, window=window)
+
+
+def iter_log_runs(file_path, keys=None, window=2**24):
+    '''
+        Split a log w/ several runs (eg concatenated sessions) at each 'COGENT START' row,
+        yielding each run's event index in turn (see load_log_events), so memory is bounded by a run
+
+        Arguments
+        ---------
+        file_path : str
+            Path to the log file
+        keys : list of str (optional, default=None)
+            Only keep key events w/ these key codes
+        window : int (optional, default=2**24)
+            Bytes of the log parsed at a time
+
+        Yields
+        ------
+        np.array
+            structured array w/ log_event_dtype for a run
+    '''
+    with _map_log(file_path) as log:
+        run_starts = []
+        ix = log.find(_log_run_start)
+        while ix != -1:
+            run_starts.append(log.rfind(b'\n', 0, ix) + 1) # start of the row
+            ix = log.find(_log_run_start, ix + 1)
+        run_starts = [0] + run_starts[1:] # anything before the first run belongs to it
+        for start, end in zip(run_starts, run_starts[1:] + [len(log)]):
+            yield _scan_log(log, start, end, keys=keys, window=window)
+
+
+class _map_log:
+    ''' read-only memory map of a log (an empty log maps to b'') '''
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'rb')
+        try:
+            self.log = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # can't map an empty file
+            self.log = b''
+
+    def __enter__(self):
+        return self.log
+
+    def __exit__(self, *args):
+        if isinstance(self.log, mmap.mmap): self.log.close()
+        self.file.close()
+
+
+def _scan_log(log, start, end, keys=None, window=2**24):
+    ''' parse log[start:end] in windows of whole lines '''
+    chunks = [np.zeros(0, dtype=log_event_dtype)]
+    while start < end:
+        stop = log.find(b'\n', min(start + window, end) - 1, end) + 1 # end the window after a whole line
+        if stop == 0: stop = end
+        chunks.append(_log_rows_to_events(_log_row_regex.findall(log, start, stop), keys=keys))
+        start = stop
+    return np.concatenate(chunks)
+
+
+def _log_rows_to_events(rows, keys=None):
+    ''' regex matches of _log_row_regex -> structured array '''
+    if len(rows) == 0: return np.zeros(0, dtype=log_event_dtype)
+    rows     = np.array(rows, dtype=bytes)
+    is_key   = rows[:,1] != b''
+    if keys is not None:
+        rows   = rows[~is_key | np.isin(rows[:,1], np.array(keys, dtype=bytes))]
+        is_key = rows[:,1] != b''
+    is_slide = rows[:,4] != b''
+    events   = np.zeros(len(rows), dtype=log_event_dtype)
+    events['log_time'] = rows[:,0].astype('int64')
+    events['time']     = np.where(is_key, rows[:,3], np.where(is_slide, rows[:,6], b'-1')).astype('int64')
+    events['kind']     = np.where(is_key, LOG_KEY, np.where(is_slide, LOG_SLIDE, LOG_OTHER))
+    events['key']      = np.where(is_key, rows[:,1], b'-1').astype('int16')
+    events['slide']    = np.char.decode(np.where(is_slide, rows[:,4], rows[:,7]), 'latin-1')
+    events['is_start'] = (rows[:,2] == b'DOWN') | (rows[:,5] == b'start')
+    return events
+
+
+def parse_log_choices(events, keys, verbose=False):
+    '''
+        Parse the decision trials from a cogent log
+
+        Each valid button press (a 'Key DOWN' of button 1 or 2) is assigned to its response window
+        [slide start, slide start + 11988ms] w/ one np.searchsorted over the decision slide starts;
+        only presses logged between the slide's start & end rows count
+        The per-trial outputs are then grouped reductions over the assigned presses:
+        - decision: from the first press
+        - button press & reaction time: from the latest press
+        - presses_conflict: whether the latest press disagrees w/ the first (nan if only 1 press)
+
+        Arguments
+        ---------
+        events : np.array
+            Log event index (see load_log_events)
+        keys : list of str
+            Key codes for buttons 1 & 2 (see get_log_keys)
+        verbose : bool (optional, default=False)
+
+        Returns
+        -------
+        choice_data : pd.DataFrame
+            One row per decision trial, to pass to merge_choice_data
+        rows_read : np.array
+            Number of log rows read for each decision trial (since the previous trial's end)
+    '''
+
+    trials   = info.decision_trials
+    slides   = trials['cogent_slide_num'].values.astype(str)
+    options  = trials[['cogent_opt1', 'cogent_opt2']].values.astype(int)
+    n_trials = len(trials)
+
+    #------------------------------------------------------------
+    # decision slide windows
+    #------------------------------------------------------------
+
+    is_slide   = events['kind'] == LOG_SLIDE
+    start_rows = np.where(is_slide & events['is_start'])[0]
+    end_rows   = np.where(is_slide & ~events['is_start'])[0]
+
+    # the first time each slide is shown
+    names, first = np.unique(events['slide'][start_rows], return_index=True)
+    name_ix      = np.minimum(np.searchsorted(names, slides), len(names) - 1)
+    found        = names[name_ix] == slides
+    trial_rows   = np.where(found, start_rows[first[name_ix]], -1)
+    slide_starts = np.where(found, events['time'][trial_rows], np.nan)
+
+    # each slide ends at the next slide end row (or the end of the log)
+    end_ix     = np.searchsorted(end_rows, trial_rows, side='right')
+    closed     = found & (end_ix < len(end_rows))
+    trial_ends = np.append(end_rows, len(events))[end_ix]
+
+    for slide in slides[~found]:
+        if verbose: print('ERROR: %s_start not found!' % slide)
+
+    #------------------------------------------------------------
+    # assign presses to windows
+    #------------------------------------------------------------
+
+    press_rows  = np.where((events['kind'] == LOG_KEY) & events['is_start'] & np.isin(events['key'], np.array(keys, dtype=int)))[0]
+    press_times = events['time'][press_rows]
+    press_bps   = np.where(events['key'][press_rows] == int(keys[0]), 1, 2) # index (1) or middle (2) finger
+
+    # latest slide start strictly before each press
+    order = np.where(found)[0][np.argsort(slide_starts[found], kind='stable')]
+    win   = np.searchsorted(slide_starts[order], press_times, side='left') - 1
+    t     = order[np.maximum(win, 0)] if len(order) else np.zeros_like(win)
+    valid = ((win >= 0)
+             & (press_times < slide_starts[t] + 11988) # slide end is 11988ms after start
+             & (press_rows > trial_rows[t]) & (press_rows < trial_ends[t]))
+    t, press_times, press_bps = t[valid], press_times[valid], press_bps[valid]
+
+    #------------------------------------------------------------
+    # grouped reductions
+    #------------------------------------------------------------
+
+    presses_found = np.bincount(t, minlength=n_trials)
+    responded     = np.where(presses_found > 0)[0]
+    first_ix      = np.unique(t, return_index=True)[1]
+    last_ix       = len(t) - 1 - np.unique(t[::-1], return_index=True)[1]
+    decisions     = options[t, press_bps - 1]
+
+    decision, last_decision, button_press, rts = np.zeros((4, n_trials), dtype=int)
+    decision[responded]      = decisions[first_ix]
+    last_decision[responded] = decisions[last_ix]
+    button_press[responded]  = press_bps[last_ix]
+    rts[responded]           = press_times[last_ix] - slide_starts[responded]
+
+    conflicts = np.where(presses_found > 1, (last_decision != decision) * 1., np.nan)
+    for t_ in np.where(conflicts == 1)[0]:
+        if verbose: print('conflict: %s: %s, %s' % (slides[t_], decision[t_], last_decision[t_]))
+
+    # rows read between the previous trial's end & this trial's end, in log order
+    rows_read = np.zeros(n_trials, dtype=int)
+    in_log    = np.where(closed)[0][np.argsort(trial_ends[closed], kind='stable')]
+    rows_read[in_log] = np.diff(np.concatenate([[-1], trial_ends[in_log]]))
+
+    # the first time the first character's image is shown
+    task_start  = events['time'][(events['slide'] == 'pic_1') & events['is_start']][0]
+    dim_mask    = (trials['dimension'] == 'affil').values
+    choice_data = pd.DataFrame({'slide_num': trials['cogent_slide_num'].values,
+                                'decision_num': np.arange(1, n_trials + 1),
+                                'onset': (slide_starts - task_start) / 1000,
+                                'presses_found': presses_found,
+                                'presses_conflict': conflicts,
+                                'button_press': button_press,
+                                'decision': decision,
+                                'affil': decision * dim_mask,
+                                'power': decision * ~dim_mask,
+                                'reaction_time': rts / 1000})
+    return choice_data, rows_read
+
+
+def parse_log_timing(events):
+    '''
+        Onsets, offsets & durations of every slide in a cogent log
+
+        Each slide start is paired w/ the next slide end row in the log (if it has the same name),
+        w/ one np.searchsorted, instead of merging every start & end of a slide name
+
+        Arguments
+        ---------
+        events : np.array
+            Log event index (see load_log_events)
+
+        Returns
+        -------
+        pd.DataFrame
+            one row per slide, times in seconds from the first slide onset
+    '''
+
+    is_slide   = events['kind'] == LOG_SLIDE
+    start_rows = np.where(is_slide & events['is_start'])[0]
+    end_rows   = np.where(is_slide & ~events['is_start'])[0]
+
+    end_ix  = np.searchsorted(end_rows, start_rows, side='right')
+    closed  = end_ix < len(end_rows)
+    start_rows, end_rows = start_rows[closed], end_rows[end_ix[closed]]
+    paired  = events['slide'][start_rows] == events['slide'][end_rows]
+    start_rows, end_rows = start_rows[paired], end_rows[paired]
+
+    onset_raw, offset_raw = events['time'][start_rows], events['time'][end_rows]
+    time0     = events['time'][is_slide & events['is_start']][0]
+    order     = np.argsort(onset_raw, kind='stable')
+    timing_df = pd.DataFrame({'slide': events['slide'][start_rows][order],
+                              'onset_raw': onset_raw[order], 'offset_raw': offset_raw[order]})
+    timing_df[['onset', 'offset']] = (timing_df[['onset_raw', 'offset_raw']] - time0) / 1000 # turn into seconds
+    timing_df['duration'] = timing_df['offset'] - timing_df['onset']
+    timing_df = timing_df[(timing_df['duration'] < 13) & (timing_df['duration'] > 0)] # drops unclosed slides
+    timing_df.reset_index(drop=True, inplace=True)
+
+    # sort by info.task['cogent_onset]
+    timing_df.insert(1, 'trial_type', info.task['trial_type'].values.reshape(-1,1))
+    return timing_df
+
+
+def parse_log(file_path, experimenter, output_timing=True, out_dir=None, fmt=None, cache=True, verbose=False):
+    '''
+        Parse social navigation cogent logs & generate data tables
 
         Arguments
         ---------
@@ -178,9 +633,13 @@ def parse_log(file_path, experimenter, output_timing=True, out_dir=None, verbose
         experimenter : _type_
             Button numbers changed depending on the experiment
         output_timing : bool (optional, default=True)
-            Set to true if want timing files 
+            Set to true if want timing files
         out_dir : str (optional, default=None)
-            Specify the output directory 
+            Specify the output directory
+        fmt : str (optional, default=None)
+            Output table format (see utils.write_table); None uses utils.default_table_format
+        cache : bool (optional, default=True)
+            Skip logs already parsed w/ the same contents & parameters (see check_cache)
 
         [By Matthew Schafer; github: @matty-gee; 2020ish]
     '''
@@ -210,108 +669,29 @@ def parse_log(file_path, experimenter, output_timing=True, out_dir=None, verbose
 
     file_path = Path(file_path)
     sub_id    = re.split('_|\.', file_path.name)[1] # expects a file w/ snt_subid
+    keys, _   = get_log_keys(experimenter)
 
-    # key presses differed across iterations of the task: 
-    # - these versions had a fixed choice order across subjects
-    experimenter = experimenter.lower()
-    if experimenter == 'rt': 
-        keys = ['30','31'] # 1,2
-        tr_key = '63'
-    elif experimenter in ['af','rr']: 
-        keys = ['28','29']
-    elif experimenter in ['nr','cs','kb','ff']: 
-        keys = ['29','30']
-        tr_key = '54'
-
-    # Read input data into data variable - a list of all the rows in input file
-    # Each data row has 4 or 8 items, for example:
-        #['432843', '[1]', ':', 'Key', '54', 'DOWN', 'at', '418280  ']
-        #['384919', '[3986]', ':', 'slide_28_end: 384919']
-    with open(file_path, 'r') as csvfile: 
-        data = [row for row in csv.reader(csvfile, delimiter = '\t') if len(row) in {8, 4}]
+    if fmt is None: fmt = utils.default_table_format # the cache records the format actually written
+    params = {'experimenter': experimenter.lower(), 'output_timing': output_timing, 'fmt': fmt}
+    if cache:
+        cached = check_cache(out_dir, 'parse_log', file_path, params)
+        if cached is not None:
+            if verbose: print(f'{sub_id}: log & parameters unchanged; using cached outputs')
+            return cached[0]
+
+    events    = load_log_events(file_path)
+    if not np.any(events['kind'] == LOG_SLIDE): 
+        raise Exception(f'No slides found in {file_path}; is this a cogent log?')
 
     #------------------------------------------------------------
     # parse data into a standardized xlsx
     #------------------------------------------------------------
 
-    choice_data = pd.DataFrame()
-
-    # find the first slide onset --> eg, ['50821', '[11]', ':', 'pic_1_start: 50811']
-    # also first scan trigger and TR
-    first_img  = [row for row in data if row[3].startswith('pic_1_start')][0] # the first time the first character's image is shown
-    task_start = int(first_img[3].split()[1])
-
-    for t, trial in info.decision_trials.iterrows():
-
-        slide_num = trial['cogent_slide_num']
-        row_num = -1
-        press_found = 0 # record if valid button push is found
-
-        # find the row numbdr for this trial 
-        while row_num < len(data):
-            row_num += 1
-            if data[row_num][3].startswith("%s_start" % slide_num):
-                break
-
-        # slide start onset
-        if row_num < len(data):
-            slide_start = int(data[row_num][3].split()[1])
-            slide_onset = (slide_start - task_start) / 1000
-            slide_end   = slide_start + 11988 # slide end is 11988ms after start
-        else:
-            if verbose: print('ERROR: %s_start not found!' % trial['cogent_slide_num'])
-
-        # find choices: find the next 'Key DOWN' slide(s), with a valid press & normal RT
-        while row_num < len(data):
-            
-            row_num += 1
-
-            if (data[row_num][3] == 'Key' and data[row_num][5] == 'DOWN') and \
-                (data[row_num][4] == keys[0] or data[row_num][4] == keys[1]):
-
-                # check if rt is within response window
-                press_time = int(data[row_num][7])
-                if (press_time > slide_start) and (press_time < slide_end): 
-
-                    press_found += 1
-                    key = data[row_num][4]
-                    rt  = press_time - int(slide_start)
-                    bp  = (1 if key == keys[0] else 2) # index (1) or middle (2) finger 
-
-                    # check for conflicts when multiple button presses
-                    if press_found > 1: 
-                        dec_ = int(trial['cogent_opt1'] if bp == 1 else trial['cogent_opt2']) 
-                        if dec_ != dec:
-                            press_conflict = 1
-                            if verbose: print('conflict: %s: %s, %s' % (slide_num, dec, dec_))
-                        else:
-                            press_conflict = 0
-                    # first response: default to this for now
-                    else:
-                        dec = int(trial['cogent_opt1'] if bp == 1 else trial['cogent_opt2'])
-                        press_conflict = np.nan
-
-                if verbose: print('%s: %s, %s, %s, %s' % (slide_num, bp, dec, rt, press_conflict))
-                
-    
-            # if slide ends before finding valid button push
-            elif "_end" in data[row_num][3]: 
-                if press_found == 0: rt, bp, dec, press_conflict  = 0, 0, 0, np.nan
-                break
-        
-        #------------------------------------------------------------
-        # output trial info
-        #------------------------------------------------------------
-
-        if trial['dimension'] == 'affil': dim_decs = [dec, 0]
-        else:                             dim_decs = [0, dec]
-        choice_data.loc[t, ['slide_num','decision_num','onset','presses_found','presses_conflict', \
-                            'button_press','decision','affil','power','reaction_time']] \
-                            = [slide_num, t+1, slide_onset, press_found, press_conflict, bp, dec] + dim_decs + [rt/1000]
+    choice_data, rows_read = parse_log_choices(events, keys, verbose=verbose)
+    if verbose: print(f'{sub_id}: read {np.sum(rows_read)} of {len(events)} rows; rows per trial: {rows_read.tolist()}')
 
     choice_data = merge_choice_data(choice_data)
-    out_fname   = str(Path(f'{xlsx_dir}/SNT_{sub_id}.xlsx'))
-    choice_data.to_excel(out_fname, index=False)
+    out_fname   = utils.write_table(choice_data, f'{xlsx_dir}/SNT_{sub_id}', fmt=fmt)
 
     #------------------------------------------------------------
     # output timing info
@@ -319,72 +699,369 @@ def parse_log(file_path, experimenter, output_timing=True, out_dir=None, verbose
 
     if output_timing:
 
-        onsets = []
-        offsets = []
-        trs = []
-
-        for row in data: 
-            if all(r in row for r in ['Key', tr_key, 'DOWN']):
-                trs.append(int(row[0].split(': ')[0]))
-            start = [r for r in row if 'start' in r]
-            if len(start) > 0:
-                onsets.append(start[0].split(': '))
-            end = [r for r in row if 'end' in r]
-            if len(end) > 0:
-                offsets.append(end[0].split(': ')) 
-
-        # will be 1 more offset than on, so do separately and then merge on the slide number
-        onsets = np.array(onsets)
-        onsets[:,0] = [txt.split('_start')[0] for txt in onsets[:,0]]            
-        onsets_df = pd.DataFrame(onsets, columns = ['slide', 'onset_raw'])
-
-        offsets = np.array(offsets)
-        offsets[:,0] = [txt.split('_end')[0] for txt in offsets[:,0]]
-        offsets_df = pd.DataFrame(offsets, columns = ['slide', 'offset_raw'])
-
-        timing_df = onsets_df.merge(offsets_df, on='slide')
-        timing_df[['onset_raw', 'offset_raw']] = timing_df[['onset_raw', 'offset_raw']].astype(int)
-        timing_df.sort_values(by='onset_raw', inplace=True) 
-
-        time0 = int(onsets_df['onset_raw'][0])
-        timing_df[['onset', 'offset']] = (timing_df[['onset_raw', 'offset_raw']] - time0) / 1000 # turn into seconds
-        timing_df['duration'] = timing_df['offset'] - timing_df['onset']
-        timing_df = timing_df[(timing_df['duration'] < 13) & (timing_df['duration'] > 0)] # removes annoying pic slide duplicates...
-        timing_df.reset_index(drop=True, inplace=True)
-
-        # sort by info.task['cogent_onset]
-        timing_df.insert(1, 'trial_type', info.task['trial_type'].values.reshape(-1,1))
+        timing_df = parse_log_timing(events)
 
         assert timing_df['onset'][0] == 0.0, f'WARNING: {sub_id} first onset is off'
         assert timing_df['offset'].values[-1] < 1600, f'WARNING: {sub_id} timing seems too long'
         assert np.sum(timing_df['duration'] > 11) == 63, f'WARNING: {sub_id} number of decisions are not 63'
 
-        timing_df.to_excel(Path(f'{timing_dir}/SNT_{sub_id}_timing.xlsx'), index=False)
+        timing_fname = utils.write_table(timing_df, f'{timing_dir}/SNT_{sub_id}_timing', fmt=fmt)
 
+    if cache: update_cache(out_dir, 'parse_log', file_path, params, [out_fname] + ([timing_fname] if output_timing else []))
     return out_fname
 
+
+def _init_log_worker(task, decision_trials):
+    ''' pre-warm a worker process w/ the reference tables from the parent, so they are not reloaded '''
+    info.task            = task
+    info.decision_trials = decision_trials
+
+
+def _log_job(func, file_path, kwargs):
+    ''' run func on one log, w/ any error recorded instead of raised '''
+    job = {'file_path': str(file_path), 'sub_id': None, 'out_fname': None, 'duration': np.nan, 'error': None}
+    start = time.perf_counter()
+    try:
+        job['sub_id']    = re.split('_|\.', Path(file_path).name)[1]
+        job['out_fname'] = func(file_path, **kwargs)
+    except Exception:
+        job['error'] = traceback.format_exc(limit=3)
+    job['duration'] = time.perf_counter() - start
+    return job
+
+
+def _run_log_jobs(func, file_paths, kwargs, n_jobs=None):
+    ''' func(file_path, **kwargs) for each log, in worker processes if n_jobs > 1; returns a manifest '''
+    if n_jobs is None: n_jobs = os.cpu_count()
+    n_jobs = max(1, min(n_jobs, len(file_paths)))
+    job_args = [[func] * len(file_paths), file_paths, [kwargs] * len(file_paths)]
+
+    if n_jobs == 1:
+        jobs = list(map(_log_job, *job_args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_log_worker, 
+                                 initargs=(info.task, info.decision_trials)) as executor:
+            jobs = list(executor.map(_log_job, *job_args, 
+                                     chunksize=max(1, len(file_paths) // (n_jobs * 4))))
+    return pd.DataFrame(jobs, columns=['file_path', 'sub_id', 'out_fname', 'duration', 'error'])
+
+
+def _list_files(file_paths, pattern='*.log'):
+    ''' directory of files matching pattern or list of paths -> sorted list of paths '''
+    if isinstance(file_paths, (str, Path)) and os.path.isdir(file_paths):
+        file_paths = glob.glob(f'{file_paths}/{pattern}')
+    return sorted((str(f) for f in file_paths if not Path(f).name.startswith('.')), key=str.lower)
+
+
+def parse_logs(file_paths, experimenter, output_timing=True, out_dir=None, fmt=None, cache=True, n_jobs=None):
+    '''
+        Parse a batch of cogent logs in parallel (see parse_log)
+
+        Each subject's errors are isolated: a failed log is recorded in the manifest & the rest carry on
+
+        Arguments
+        ---------
+        file_paths : str or list of str
+            Directory of '*.log' files, or list of log file paths
+        experimenter : str
+            Button numbers changed depending on the experiment
+        output_timing : bool (optional, default=True)
+            Set to true if want timing files
+        out_dir : str (optional, default=None)
+            Specify the output directory
+        fmt : str (optional, default=None)
+            Output table format (see utils.write_table); None uses utils.default_table_format
+        cache : bool (optional, default=True)
+            Skip logs already parsed w/ the same contents & parameters (see check_cache)
+        n_jobs : int (optional, default=None)
+            Number of worker processes; None uses all cores, 1 runs in this process
+
+        Returns
+        -------
+        pd.DataFrame
+            manifest: file path, sub id, output file, duration (s) & error for each log;
+            also written to out_dir
+    '''
+
+    file_paths = _list_files(file_paths)
+
+    # make directories up front so the workers don't race to make them
+    if out_dir is None: out_dir = Path(os.getcwd())
+    for dir_ in [out_dir, f'{out_dir}/Organized'] + ([f'{out_dir}/Timing'] if output_timing else []):
+        os.makedirs(dir_, exist_ok=True)
+
+    get_log_keys(experimenter) # fail early on an unknown key map
+    kwargs   = {'experimenter': experimenter, 'output_timing': output_timing, 'out_dir': out_dir, 'fmt': fmt, 'cache': cache}
+    manifest = _run_log_jobs(parse_log, file_paths, kwargs, n_jobs=n_jobs)
+    utils.write_table(manifest, f'{out_dir}/SNT-logs_manifest', fmt=fmt)
+    n_failed = manifest['error'].notnull().sum()
+    if n_failed: print(f'{n_failed} of {len(manifest)} logs failed; see the manifest')
+    return manifest
+
+
+# - bids events
+def log_to_bids_events(file_path, experimenter, behavior_cols=None):
+    '''
+        BIDS events table for one cogent log, built in memory (no intermediate files)
+
+        Arguments
+        ---------
+        file_path : str
+            Path to the log file
+        experimenter : str
+            Button numbers changed depending on the experiment
+        behavior_cols : list of str (optional, default=None)
+            ComputeBehavior2 output columns to add to the decision rows, eg ['affil_coord', 'power_coord'];
+            the behavior is computed from the parsed choices
+
+        Returns
+        -------
+        pd.DataFrame
+            one row per slide: onset & duration (s, from the first slide onset), trial_type, slide,
+            & for decisions their metadata, choices & response_time (n/a if no response)
+    '''
+
+    keys, _ = get_log_keys(experimenter)
+    events  = load_log_events(file_path)
+    if not np.any(events['kind'] == LOG_SLIDE):
+        raise Exception(f'No slides found in {file_path}; is this a cogent log?')
+
+    timing_df   = parse_log_timing(events)
+    timing_df['duration'] = (timing_df['offset_raw'] - timing_df['onset_raw']) / 1000 # w/o float error from onset & offset
+    choice_data = merge_choice_data(parse_log_choices(events, keys)[0])
+    decisions   = choice_data[['slide_num', 'decision_num', 'dimension', 'scene_num', 'char_role_num',
+                               'char_decision_num', 'button_press', 'decision']].copy()
+    decisions['response_time'] = choice_data['reaction_time'].where(choice_data['presses_found'] > 0)
+    if behavior_cols is not None:
+        computer = ComputeBehavior2(file=choice_data)
+        computer.run()
+        decisions[behavior_cols] = computer.out[behavior_cols].values
+
+    events_df = timing_df[['onset', 'duration', 'trial_type', 'slide']].merge(decisions, how='left',
+                                                                              left_on='slide', right_on='slide_num')
+    events_df.drop(columns='slide_num', inplace=True)
+    int_cols = ['decision_num', 'scene_num', 'char_role_num', 'char_decision_num', 'button_press', 'decision']
+    events_df[int_cols] = events_df[int_cols].astype('Int64') # keep integers w/ n/a for the other slides
+    return events_df
+
+
+def write_bids_events(file_path, experimenter, out_dir=None, behavior_cols=None, task='snt'):
+    ''' write a log's BIDS events to out_dir/sub-<sub_id>/func/sub-<sub_id>_task-<task>_events.tsv (see log_to_bids_events) '''
+    if out_dir is None: out_dir = Path(os.getcwd())
+    sub_id    = re.split('_|\.', Path(file_path).name)[1] # expects a file w/ snt_subid
+    events_df = log_to_bids_events(file_path, experimenter, behavior_cols=behavior_cols)
+    func_dir  = Path(f'{out_dir}/sub-{sub_id}/func')
+    os.makedirs(func_dir, exist_ok=True)
+    out_fname = str(Path(f'{func_dir}/sub-{sub_id}_task-{task}_events.tsv'))
+    events_df.to_csv(out_fname, sep='\t', index=False, na_rep='n/a')
+    return out_fname
+
+
+def logs_to_bids_events(file_paths, experimenter, out_dir=None, behavior_cols=None, task='snt', n_jobs=None):
+    '''
+        Write BIDS events.tsv files for a batch of cogent logs, in parallel (see log_to_bids_events)
+
+        Arguments
+        ---------
+        file_paths : str or list of str
+            Directory of '*.log' files, or list of log file paths
+        experimenter : str
+            Button numbers changed depending on the experiment
+        out_dir : str (optional, default=None)
+            BIDS root directory
+        behavior_cols : list of str (optional, default=None)
+            ComputeBehavior2 output columns to add to the decision rows
+        task : str (optional, default='snt')
+            BIDS task label
+        n_jobs : int (optional, default=None)
+            Number of worker processes; None uses all cores, 1 runs in this process
+
+        Returns
+        -------
+        pd.DataFrame
+            manifest: file path, sub id, events file, duration (s) & error for each log
+    '''
+
+    file_paths = _list_files(file_paths)
+    if out_dir is None: out_dir = Path(os.getcwd())
+    os.makedirs(out_dir, exist_ok=True)
+
+    get_log_keys(experimenter) # fail early on an unknown key map
+    kwargs   = {'experimenter': experimenter, 'out_dir': out_dir, 'behavior_cols': behavior_cols, 'task': task}
+    manifest = _run_log_jobs(write_bids_events, file_paths, kwargs, n_jobs=n_jobs)
+    n_failed = manifest['error'].notnull().sum()
+    if n_failed: print(f'{n_failed} of {len(manifest)} logs failed; see the manifest')
+    return manifest
+
+
 # - csvs
+@lru_cache(maxsize=None)
+def validated_options(snt_ver):
+    ''' affil & power values of each decision's alphabetically sorted options (63 x 2 arrays) & their slide numbers '''
+    validated_decisions = info.validated_decisions[snt_ver]
+    return (validated_decisions[['option1_affil', 'option2_affil']].values.astype(int), 
+            validated_decisions[['option1_power', 'option2_power']].values.astype(int),
+            validated_decisions['slide_num'].values.astype(int))
+
+
+# answer keys of the post-task tests
+# - memory: correct answers when questions are alphabetically sorted, as indices into info.character_roles
+#   {0: 'first', 1: 'second', 2: 'assistant', 3: 'newcomb', 4: 'hayworth', 5: 'neutral'}
+memory_answer_keys = {'standard':   [1,4,5,4,5,0,0,0,4,1,3,3,1,4,5,3,1,0,2,5,5,2,2,2,3,3,0,1,2,4],
+                      # original? : [1,3,5,3,5,0,0,0,3,1,2,2,1,3,5,2,1,0,4,5,5,4,4,4,2,2,0,1,4,3]...????
+                      'adolescent': [1,4,0,5,5,4,0,0,0,4,3,3,3,4,1,5,3,1,2,5,2,5,1,2,2,2,3,0,1,4]}
+memory_answer_keys['schema'] = memory_answer_keys['standard']
+memory_scores = np.concatenate([[0], np.cumsum(np.full(30, 1/5))]) # score for n correct, summed like 1/5 per answer
+
+# - iq: {question: answer}
+iq_answers = {'vr4': '5', 'vr16': 'its', 'vr17': '47', 'vr19': 'sunday',
+              'ln7': 'x', 'ln33': 'g', 'ln34': 'x', 'ln58': 'n',
+              'mx45': 'e', 'mx46': 'b', 'mx47': 'b', 'mx55': 'd',
+              'r3d3': 'c', 'r3d4': 'b', 'r3d6': 'f', 'r3d8': 'g'}
+
+
+# - realworld relationships: 'realworld_relationships_<category>_number_of_people_value' & '..._people_<n>_<rating>'
+realworld_regex = re.compile(r'realworld_relationships_(?P<cat>.+?)_(?:number_of_people_value|people_(?P<person>[0-9]+)_(?P<rating>.+))$')
+
+# - trust game: 'trust_game_round<XX>_trial<YY>_<field>'
+trust_game_regex = re.compile(r'trust_game_round(?P<round>[0-9]+)_trial(?P<trial>[0-9]+)_(?P<field>partner|choice|rt|outcome)$')
+
+
+def _to_float(values):
+    ''' array of values as floats: nan if not a number '''
+    return pd.to_numeric(pd.Series(np.asarray(values).ravel()), errors='coerce').values.astype(float).reshape(np.shape(values))
+
+
+# column header renames across task versions, applied in one pass after the character name replacements
+# - the compound pattern covers renames that chain, eg 'snt.judgments' -> 'snt_judgments' -> 'judgments'
+header_substitutions = [(r'(?:snt|narrative|self)[._](?:judgments|demographics)', 'judgments'),
+                        (r'relationship[._]feelings', 'character_relationship'),
+                        (r'narrative', 'snt'),
+                        (r'demographics', 'judgments'),
+                        (r'\.', '_')]
+
+# the (standardized) columns each task reads
+column_buckets = {'character_info':  lambda c: 'character_info_' in c,
+                  'memory':          lambda c: 'memory' in c,
+                  'memory_question': lambda c: ('memory' in c) & ('question' in c),
+                  'memory_resp':     lambda c: ('memory' in c) & ('resp' in c),
+                  'memory_rt':       lambda c: ('memory' in c) & ('rt' in c),
+                  'dots':            lambda c: 'dots' in c,
+                  'judgments':       lambda c: 'judgments' in c,
+                  'judgments_resp':  lambda c: re.match('judgments_.+_resp', c) is not None,
+                  'forced_choice':   lambda c: 'forced_choice' in c,
+                  'schema':          lambda c: 'schema' in c,
+                  'schema_resp':     lambda c: ('schema' in c) & ('resp' in c),
+                  'trust':           lambda c: 'trust' in c,
+                  'trust_pre':       lambda c: ('snt_trust_ratings_pre' in c) & ('resp' in c),
+                  'trust_post':      lambda c: ('snt_trust_ratings_post' in c) & ('resp' in c),
+                  'trust_game':      lambda c: 'trust_game_round' in c,
+                  'estimate':        lambda c: 'estimate' in c,
+                  'realworld':       lambda c: 'realworld_relationships' in c,
+                  'free_response':   lambda c: 'free_response' in c,
+                  'questions':       lambda c: 'questions' in c,
+                  'iq':              lambda c: 'iq' in c,
+                  'iq_mx47':         lambda c: 'iq_mx47' in c,
+                  'iq_resp':         lambda c: ('iq' in c) & ('resp' in c)}
+
+
+@lru_cache(maxsize=None)
+def character_substitutions(task_ver):
+    ''' {character name: role} for a task version, & the regex that finds the names (see utils.substitution_regex) '''
+    replace_substrings = {'newcomb':'powerful', 'hayworth':'boss'}
+    if 'O' in task_ver or 'Y' in task_ver:  # this doesnt apply to adolescent version...
+        if 'F' in task_ver: 
+            order = ['maya','chris','anthony','newcomb','hayworth','kayce']
+        else: 
+            order = ['chris','maya','kayce','newcomb','hayworth','anthony']
+        for name in order: replace_substrings[name] = info.character_roles[order.index(name)]
+    return replace_substrings, utils.substitution_regex(replace_substrings)
+
+
+@lru_cache(maxsize=None)
+def column_plan(task_ver, columns):
+    '''
+        Standardize a csv's column headers & route them to the tasks, once per header signature
+        Files from the same export (task version & columns) reuse the plan
+
+        Arguments
+        ---------
+        task_ver : str
+        columns : tuple of str
+            The csv's column headers
+
+        Returns
+        -------
+        headers : list of str
+            The standardized headers
+        buckets : dict
+            {bucket: array of column positions}, for the buckets in column_buckets
+    '''
+
+    # replace column headers, in one pass over all of them
+    replace_substrings, _ = character_substitutions(task_ver)
+    header_regex = utils.substitution_regex(replace_substrings, header_substitutions)
+    headers = '\n'.join(map(str.lower, columns))
+    headers = utils.substitute(header_regex, headers, replace_substrings, header_substitutions).split('\n')
+    
+    # race judgments may need to be reworked
+    if utils.substring_in_strings('race', headers):
+        race_cols = utils.get_strings_matching_pattern(headers, 'race_*_*')
+        rename = {}
+        for col in race_cols:
+            split_ = col.split('_')
+            rename[col] = f'judgment_{split_[1]}_{split_[0]}_{split_[2]}'
+        headers = [rename.get(c, c) for c in headers]
+
+    buckets = {bucket: np.array([c for c, col in enumerate(headers) if in_bucket(col)], dtype=int) 
+               for bucket, in_bucket in column_buckets.items()}
+    return headers, buckets
+
+
 class ParseCsv:
     
-    def __init__(self, csv_path, snt_version='standard', verbose=0):
+    def __init__(self, csv_path, snt_version='standard', verbose=0, data=None, cohort=False):
+        '''
+            Parse an online snt csv: a single participant, or a group of participants (cohort mode, see ParseCohortCsv)
+
+            Arguments
+            ---------
+            csv_path : str
+                Path to the csv (or the file the data came from, eg a VTech txt)
+            snt_version : str (optional, default='standard')
+                'standard', 'schema' or 'adolescent_pilot'
+            verbose : int (optional, default=0)
+            data : pd.DataFrame (optional, default=None)
+                The csv's contents, if already in memory (eg from read_vtech_txt); if None, the csv is read
+            cohort : bool (optional, default=False)
+                If True, the rows share a task_ver & are one per participant: each task is parsed over all of them at once
+                If False, the first row is parsed
+        '''
 
         self.verbose    = verbose
         self.csv        = csv_path
-        self.data       = pd.read_csv(csv_path)
+        self.cohort     = cohort
+        if data is None: 
+            data = pd.read_csv(csv_path)
+        if self.cohort:
+            self.data   = data.reset_index(drop=True)
+        else: # data can be two identical rows for some reason
+            self.data   = data.iloc[[0],:]
         self.task_ver   = self.data['task_ver'].values[0]
         
         if snt_version == 'adolescent_pilot':
             self.snt_ver = 'adolescent'
-            try:
-                self.sub_id = self.data.initials.values[0]
-            except: 
-                try: 
-                    self.sub_id = self.data.prolific_id.values[0]
-                except: 
-                    self.sub_id = 'no_name'
+            id_cols = ['initials', 'prolific_id']
         else:
             self.snt_ver = snt_version
-            self.sub_id  = self.data.prolific_id.values[0]
+            id_cols = ['prolific_id']
+        id_cols = [c for c in id_cols if c in self.data.columns]
+        if len(id_cols) == 0:
+            if snt_version != 'adolescent_pilot': raise Exception(f'{csv_path} does not have a "prolific_id" column')
+            self.sub_ids = ['no_name'] if len(self.data) == 1 else [f'no_name{r + 1:02d}' for r in range(len(self.data))]
+        else:
+            self.sub_ids = list(self.data[id_cols[0]].values)
+        self.sub_id = self.sub_ids[0]
 
         self.clean()
 
@@ -409,52 +1086,34 @@ class ParseCsv:
 
     def clean(self):
         
-        # data can be two identical rows for some reason
-        if self.data.shape[0] > 1: 
-            self.data = self.data.iloc[0,:].to_frame().T
-        
         ### standardize naming conventions ###
         # there have been multiple versions of the task, multiple naming conventions etc..
         # this is an attempt to standardize the naming before extracting variables
 
-        # make everything lower case
-        self.data.columns = map(str.lower, self.data.columns)
-        self.data = self.data.apply(lambda x: x.astype(str).str.lower())
-
         # replace character names w/ their roles
-        replace_substrings = {'newcomb':'powerful', 'hayworth':'boss'}
-
-        if 'O' in self.task_ver or 'Y' in self.task_ver:  # this doesnt apply to adolescent version...
-            if 'F' in self.task_ver: 
-                order = ['maya','chris','anthony','newcomb','hayworth','kayce']
-            else: 
-                order = ['chris','maya','kayce','newcomb','hayworth','anthony']
-            for name in order: replace_substrings[name] = info.character_roles[order.index(name)]
-
-        self.data.replace(replace_substrings, inplace=True, regex=True) # replace elements
-        
-        # replace column headers
-        replace_substrings['.'] = '_'
-        replace_substrings['narrative'] = 'snt'
-        replace_substrings['demographics'] = 'judgments'
-        replace_substrings['snt_judgments'] = 'judgments'
-        replace_substrings['self_judgments'] = 'judgments'
-        replace_substrings['relationship_feelings'] = 'character_relationship'
-        for k,i in replace_substrings.items():
-            self.data.columns = self.data.columns.str.replace(k,i, regex=True)
-        
-        # race judgments may need to be reworked
-        if utils.substring_in_strings('race', self.data.columns):
-            race_cols = utils.get_strings_matching_pattern(self.data.columns, 'race_*_*')
-            rename = {}
-            for col in race_cols:
-                split_ = col.split('_')
-                rename[col] = f'judgment_{split_[1]}_{split_[0]}_{split_[2]}'
-            self.data.rename(columns=rename, inplace=True)
+        replace_substrings, name_regex = character_substitutions(self.task_ver)
+
+        # make text lower case & replace elements: numeric columns are left as they are
+        text_cols = [c for c, dtype in self.data.dtypes.items() if dtype.kind not in 'iufc']
+        text      = pd.Series(self.data[text_cols].values.astype(str).ravel()).str.lower()
+        has_name  = text.str.contains(name_regex)
+        text[has_name] = [utils.substitute(name_regex, t, replace_substrings) for t in text[has_name]]
+        text = dict(zip(text_cols, text.values.reshape(len(self.data), -1).T))
+        self.data = pd.DataFrame({c: (text[c] if c in text else self.data[c].values) for c in self.data.columns}, 
+                                 columns=self.data.columns, index=self.data.index)
+
+        # standardize the headers & find each task's columns
+        headers, self.plan = column_plan(self.task_ver, tuple(self.data.columns))
+        self.data.columns  = headers
             
         return self.data
+
+    def columns(self, bucket):
+        ''' the headers of a bucket of columns (see column_plan) '''
+        return list(self.data.columns[self.plan[bucket]])
    
-    def run(self):
+    def run(self, compact=False):
+        ''' compact: coerce the outputs to the data dictionary's dtypes (see info.coerce_dtypes) '''
 
         self.task_functions = {'snt': self.process_snt,
                                 'characters': self.process_characters,
@@ -479,23 +1138,35 @@ class ParseCsv:
             if isinstance(out, pd.DataFrame):
                 post_snt.append(out)
 
-        self.post = pd.concat(post_snt, axis=1)
-        self.post.index = [self.sub_id]
+        self.post = pd.concat(post_snt, axis=1).reindex(self.sub_ids)
+        if self.cohort: self.post.index.name = 'prolific_id'
 
         # get the date somehow: 
         if 'date' in self.data.columns:
-            date = self.data.date.values[0]
+            date = self.data.date.values
         else:
             date = self.csv.split('/')[-1].split('_')[3].replace('-','/')
         self.post.insert(0, 'date', date)
 
         # experiment info (esp. for multi-day schema)
         if 'experiment' in self.data.columns:
-            self.post.insert(1, 'experiment', self.data.experiment.values[0])
+            self.post.insert(1, 'experiment', self.data.experiment.values)
         
         # self.post.insert(1, 'task_ver', self.data.task_ver)
 
+        if compact:
+            if self.snt is not None: self.snt = info.coerce_dtypes(self.snt)
+            self.post = info.coerce_dtypes(self.post)
         return [self.snt, self.post]
+
+    def row_parser(self, r):
+        ''' a shallow copy of this parser w/ only row r of the data, eg to parse one participant of a cohort '''
+        parser         = copy.copy(self)
+        parser.data    = self.data.iloc[[r],:]
+        parser.sub_id  = self.sub_ids[r]
+        parser.sub_ids = [self.sub_ids[r]]
+        parser.cohort  = False
+        return parser
     
     def process_snt(self):
 
@@ -506,43 +1177,53 @@ class ParseCsv:
         else:
             
             # the options alphabetically sorted to allow easy standardization
-            validated_decisions = info.validated_decisions[self.snt_ver]
+            affil_opts, power_opts, slide_nums = validated_options(self.snt_ver)
+            n_opts = len(affil_opts)
 
-            snt_bps  = np.array([int(utils.remove_nonnumeric(d.split(':')[1])) for d in self.data['snt_choices'].values[0].split(',')]) # single column
-            snt_opts = self.data['snt_opts_order'].values[0].split('","') # split on delimter
-            self.snt = pd.DataFrame(columns=['decision_num', 'button_press', 'decision', 'affil', 'power'])
-
-            for q, question in enumerate(snt_opts):
-
-                # organize
-                opt1    = utils.remove_nontext(question.split(';')[1]) # this delimeter might change?
-                opt2    = utils.remove_nontext(question.split(';')[2])
-                sort_ix = np.argsort((opt1, opt2)) # order options alphabetically
-
-                # parse the choice
-                choice   = sort_ix[snt_bps[q] - 1] + 1 # choice -> 1 or 2, depending on alphabetical ordering
-                decision = validated_decisions.iloc[q]
-                affl = np.array(decision['option{}_affil'.format(int(choice))]) # grab the correct option's affil value
-                pwr  = np.array(decision['option{}_power'.format(int(choice))]) # & power
-                self.snt.loc[q,:] = [q + 1, snt_bps[q], affl + pwr, affl, pwr]
-
-            snt_rts = np.array([int(utils.remove_nonnumeric(rt)) for rt in self.data['snt_rts'].values[0].split(',')])
-            self.snt['reaction_time'] = snt_rts[np.array(validated_decisions['slide_num']) - 1] / 1000
-        
-            self.snt = info.decision_trials[['decision_num','dimension','scene_num','char_role_num','char_decision_num']].merge(self.snt, on='decision_num')
-            convert_dict = {'decision_num': int,
-                            'dimension': str,
-                            'scene_num': int,
-                            'char_role_num': int,
-                            'char_decision_num': int,
-                            'button_press': int,
-                            'decision': int,
-                            'affil': int,
-                            'power': int,
-                            'reaction_time': float}
-            self.snt = self.snt.astype(convert_dict) 
-
-            # snt_df.to_excel(f'{self.data_dir}/Task/Organized/SNT_{self.sub_id}.xlsx', index=False)
+            # each column is split for all participants at once, one participant per line
+            # button presses & rts: '["1:2","2:1",...]' & '[45605,9735,...]'
+            choices  = [c.split(',') for c in re.sub('[^0-9:,\n]', '', '\n'.join(self.data['snt_choices'].values.astype(str))).split('\n')]
+            snt_rts  = [r.split(',') for r in re.sub('[^0-9,\n]', '', '\n'.join(self.data['snt_rts'].values.astype(str))).split('\n')]
+            
+            # options: 'num;option 1;option 2', split on delimter 
+            snt_opts = [o.split('","') for o in self.data['snt_opts_order'].values.astype(str)]
+
+            # participants w/o a complete snt can't be parsed
+            complete = np.array([(len(c) >= n_opts) & (len(r) >= slide_nums.max()) & (len(o) == n_opts) 
+                                 for c, r, o in zip(choices, snt_rts, snt_opts)])
+            if not np.all(complete):
+                if self.verbose: print(f'{np.array(self.sub_ids)[~complete]} do not have a complete snt')
+                if not np.any(complete):
+                    self.snt = None
+                    return
+            sub_ids  = np.array(self.sub_ids, dtype=object)[complete]
+            choices  = np.array([c[:n_opts] for c, k in zip(choices, complete) if k])
+            snt_bps  = np.char.partition(choices, ':')[:, :, 2].astype(int)
+            snt_rts  = np.array([r[:slide_nums.max()] for r, k in zip(snt_rts, complete) if k], dtype=int)
+            snt_opts = np.array([o for o, k in zip(snt_opts, complete) if k])
+
+            opt1     = np.char.partition(np.char.partition(snt_opts, ';')[..., 2], ';') # this delimeter might change?
+            opt2     = np.char.partition(opt1[..., 2], ';')[..., 0]
+            opt1     = opt1[..., 0]
+            opt1, opt2 = [np.array(re.sub('[^a-zA-Z\n]', '', '\n'.join(o.ravel())).split('\n')).reshape(o.shape) for o in [opt1, opt2]]
+
+            # parse the choices: 1 or 2, depending on alphabetical ordering of the options
+            choice  = np.where(opt1 > opt2, 3 - snt_bps, snt_bps)
+            affil   = affil_opts[np.arange(n_opts), choice - 1] # grab the correct option's affil value
+            power   = power_opts[np.arange(n_opts), choice - 1] # & power
+
+            # long format: the decision trials for each participant in turn
+            trials   = info.decision_trials[['decision_num','dimension','scene_num','char_role_num','char_decision_num']]
+            trial_ix = trials['decision_num'].values - 1
+            n_subs   = len(sub_ids)
+            self.snt = pd.concat([trials] * n_subs, ignore_index=True)
+            self.snt = self.snt.assign(button_press  = snt_bps[:, trial_ix].ravel().astype(int),
+                                       decision      = (affil + power)[:, trial_ix].ravel().astype(int),
+                                       affil         = affil[:, trial_ix].ravel().astype(int),
+                                       power         = power[:, trial_ix].ravel().astype(int),
+                                       reaction_time = snt_rts[:, slide_nums - 1][:, trial_ix].ravel() / 1000)
+            if self.cohort: 
+                self.snt.insert(0, 'prolific_id', np.repeat(sub_ids, len(trials)))
 
             return self.snt
 
@@ -550,97 +1231,97 @@ class ParseCsv:
         '''
            simple classes: masculine & feminine, dark skin & light skin 
         '''
-        if not utils.substring_in_strings('character_info_', self.data.columns): # older version
-            img_names = [i.lower() for i in self.img_sets[self.task_ver]]
+        if not len(self.plan['character_info']): # older version
+            img_names = np.tile([i.lower() for i in self.img_sets[self.task_ver]], (len(self.sub_ids), 1))
         else: # newer version
-            img_names = [self.data[f'character_info_{r}_img'].values[0].lower() for r in info.character_roles]
+            img_names = np.char.lower(self.data[[f'character_info_{r}_img' for r in info.character_roles]].values.astype(str))
 
-        gender_bool    = [any([ss in i for ss in ['girl','woman','female']]) for i in img_names]
-        skincolor_bool = [any([ss in i for ss in ['br','bl','brown','black','dark']]) for i in img_names]
+        gender_bool    = np.any([np.char.find(img_names, ss) >= 0 for ss in ['girl','woman','female']], axis=0)
+        skincolor_bool = np.any([np.char.find(img_names, ss) >= 0 for ss in ['br','bl','brown','black','dark']], axis=0)
 
         # make into df
-        self.characters = pd.concat([pd.DataFrame(np.array(['feminine' if b  else 'masculine' for b in gender_bool])[np.newaxis], 
-                                                    index=[self.sub_id], columns=[f'{r}_gender' for r in info.character_roles]),
-                                     pd.DataFrame(np.array(['brown' if b  else 'white' for b in skincolor_bool])[np.newaxis], 
-                                                    index=[self.sub_id], columns=[f'{r}_skincolor' for r in info.character_roles])], axis=1)
+        self.characters = pd.concat([pd.DataFrame(np.where(gender_bool, 'feminine', 'masculine'), 
+                                                    index=self.sub_ids, columns=[f'{r}_gender' for r in info.character_roles]),
+                                     pd.DataFrame(np.where(skincolor_bool, 'brown', 'white'), 
+                                                    index=self.sub_ids, columns=[f'{r}_skincolor' for r in info.character_roles])], axis=1)
         
         return self.characters
 
     def process_memory(self):
 
-        if not utils.substring_in_strings('memory', self.data.columns):
+        if not len(self.plan['memory']):
             if self.verbose: print('There are no memory columns in the csv')   
             return 
         else: 
             if self.verbose: print('Processing memory')
 
             # correct answers when questions are alphabetically sorted
-            # {0: 'first', 1: 'second', 2: 'assistant', 3: 'newcomb', 4: 'hayworth', 5: 'neutral'}
-            if self.snt_ver in ['standard', 'schema']:
-                corr = [1,4,5,4,5,0,0,0,4,1,3,3,1,4,5,3,1,0,2,5,5,2,2,2,3,3,0,1,2,4] 
-                # original? : [1,3,5,3,5,0,0,0,3,1,2,2,1,3,5,2,1,0,4,5,5,4,4,4,2,2,0,1,4,3]...????
-            elif self.snt_ver == 'adolescent':
-                corr = [1,4,0,5,5,4,0,0,0,4,3,3,3,4,1,5,3,1,2,5,2,5,1,2,2,2,3,0,1,4]
+            corr = np.array(memory_answer_keys[self.snt_ver])
             
-            memory_cols = [c for c in self.data.columns if 'memory' in c]
+            memory_cols = self.columns('memory')
             if 'memory_resps' in memory_cols or 'character_memory' in memory_cols: # older version
                 # these versions compressed responses into a single column with a delimeter
-                try: 
-                    memory_  = [t.split(';')[1:2] for t in self.data['memory_resps'].values[0].split('","')]
-                except: 
-                    memory_  = [t.split(';')[1:2] for t in self.data['character_memory'].values[0].split('","')]
-                ques_ = [m[0].split(':')[0] for m in memory_]
-                resp_ = [m[0].split(':')[1] for m in memory_]
+                ques_, resp_ = [], []
+                for r in range(len(self.data)):
+                    try: 
+                        memory_  = [t.split(';')[1:2] for t in self.data['memory_resps'].values[r].split('","')]
+                    except: 
+                        memory_  = [t.split(';')[1:2] for t in self.data['character_memory'].values[r].split('","')]
+                    ques_.append([m[0].split(':')[0] for m in memory_])
+                    resp_.append([m[0].split(':')[1] for m in memory_])
+                ques_, resp_ = np.array(ques_, dtype=object), np.array(resp_, dtype=object)
 
             else: # newer version
 
-                ques_  = self.data[[c for c in memory_cols if 'question' in c]].values[0]
-                resp_  = self.data[[c for c in memory_cols if 'resp' in c]].values[0]
+                ques_  = self.data.iloc[:, self.plan['memory_question']].values
+                resp_  = self.data.iloc[:, self.plan['memory_resp']].values
             
-            memory = sorted(list(zip(ques_, resp_)))
-            self.memory = pd.DataFrame(np.zeros((1,6)), columns=[f'memory_{cr}' for cr in info.character_roles])
-            for r, resp in enumerate(memory): 
-                if resp[1] == info.character_roles[corr[r]]: 
-                    self.memory[f'memory_{info.character_roles[corr[r]]}'] += 1/5
+            # each participant's responses sorted by question, & scored against the key
+            order  = np.lexsort((resp_.astype(str), ques_.astype(str)), axis=1)
+            memory = np.take_along_axis(resp_, order, axis=1)
+            n_corr = (memory == np.array(info.character_roles, dtype=object)[corr]).astype(int) @ np.eye(6, dtype=int)[corr]
+            self.memory = pd.DataFrame(memory_scores[n_corr], columns=[f'memory_{cr}' for cr in info.character_roles])
 
             # combine summary & trial x trial
-            self.memory['memory_mean'] = np.mean(self.memory.values)
-            self.memory['memory_rt']   = np.mean(self.data[[c for c in memory_cols if 'rt' in c]].values[0].astype(float) / 1000)
-            memory_resp_df = pd.DataFrame(np.array([r[1] for r in memory]).reshape(1, -1), 
-                                          columns=[f'memory_{q + 1 :02d}_{info.character_roles[r]}' for q, r in enumerate(corr)])
+            memory_rts = np.ascontiguousarray(self.data.iloc[:, self.plan['memory_rt']].values.astype(float))
+            self.memory['memory_mean'] = np.mean(self.memory.values, axis=1)
+            self.memory['memory_rt']   = np.mean(memory_rts / 1000, axis=1)
+            memory_resp_df = pd.DataFrame(memory, columns=[f'memory_{q + 1 :02d}_{info.character_roles[r]}' for q, r in enumerate(corr)])
 
             self.memory = pd.concat([self.memory, memory_resp_df], axis=1)
-            self.memory.index = [self.sub_id]
-            self.memory.insert(0, 'task_ver', self.data['task_ver'].values[0])
+            self.memory.index = self.sub_ids
+            self.memory.insert(0, 'task_ver', self.data['task_ver'].values)
                 
             return self.memory
     
     def process_dots(self):
 
-        if not utils.substring_in_strings('dots', self.data.columns):            
+        if not len(self.plan['dots']):            
             if self.verbose: print('There are no dots columns in the csv')
             return
         else: 
             if self.verbose: print('Processing dots')
-            dots_cols = [c for c in self.data.columns if 'dots' in c]
-            self.dots = pd.DataFrame(index=[self.sub_id], columns=[f'{c}_dots_{d}' for c in info.character_roles for d in ['affil','power']])
+            dots_cols = self.columns('dots')
+            self.dots = pd.DataFrame(index=self.sub_ids, columns=[f'{c}_dots_{d}' for c in info.character_roles for d in ['affil','power']])
 
             # rename & standardize 
             if 'dots_resps' in dots_cols: # older version
-                for row in self.data['dots_resps'].values[0].split(','):
-                    split_ = row.split(';')
-                    role = utils.remove_nontext(split_[0].split(':')[0])
-                    self.dots[f'{role}_dots_affil'] = (float(split_[1].split(':')[1]) - 500)/500
-                    self.dots[f'{role}_dots_power'] = (500 - float(split_[2].split(':')[1]))/500
+                for sub_id, resps in zip(self.sub_ids, self.data['dots_resps'].values):
+                    for row in resps.split(','):
+                        split_ = row.split(';')
+                        role = utils.remove_nontext(split_[0].split(':')[0])
+                        self.dots.loc[sub_id, f'{role}_dots_affil'] = (float(split_[1].split(':')[1]) - 500)/500
+                        self.dots.loc[sub_id, f'{role}_dots_power'] = (500 - float(split_[2].split(':')[1]))/500
+                self.dots = self.dots.astype(float)
 
             else: # newer version 
                 for role in info.character_roles:
-                    self.dots[f'{role}_dots_affil'] = (float(self.data[f'dots_{role}_affil'].values[0]) - 500)/500
-                    self.dots[f'{role}_dots_power'] = (500 - float(self.data[f'dots_{role}_power'].values[0]))/500
+                    self.dots[f'{role}_dots_affil'] = (self.data[f'dots_{role}_affil'].values.astype(float) - 500)/500
+                    self.dots[f'{role}_dots_power'] = (500 - self.data[f'dots_{role}_power'].values.astype(float))/500
 
             # get means
             for dim in ['affil','power']:
-                self.dots[f'dots_{dim}_mean'] = np.mean(self.dots[[c for c in self.dots.columns if dim in c]],1).values[0]
+                self.dots[f'dots_{dim}_mean'] = np.mean(self.dots[[c for c in self.dots.columns if dim in c]],1).values
                     
             return self.dots
 
@@ -648,24 +1329,28 @@ class ParseCsv:
         
         if 'character_dimensions' in self.data.columns: 
             if self.verbose: print('Processing ratings (older version)')
-            ratings = []
-            for col in ['character_dimensions', 'character_relationship']:
-                for row in [char.split(';') for char in self.data[col].values[0].split(',')]: 
-                    role     = utils.remove_nontext(row[0])
-                    dims     = [utils.remove_nontext(r) for r in row[1:-1]] # last is rt
-                    ratings_ = [int(utils.remove_nonnumeric(r)) for r in row[1:-1]]
-                    ratings.append(pd.DataFrame(np.array(ratings_)[np.newaxis], index=[self.sub_id], columns=[f'{role}_{d}' for d in dims]))
-            self.ratings = pd.concat(ratings, axis=1)   
+            sub_ratings = []
+            for r, sub_id in enumerate(self.sub_ids):
+                ratings = []
+                for col in ['character_dimensions', 'character_relationship']:
+                    for row in [char.split(';') for char in self.data[col].values[r].split(',')]: 
+                        role     = utils.remove_nontext(row[0])
+                        dims     = [utils.remove_nontext(r) for r in row[1:-1]] # last is rt
+                        ratings_ = [int(utils.remove_nonnumeric(r)) for r in row[1:-1]]
+                        ratings.append(pd.DataFrame(np.array(ratings_)[np.newaxis], index=[sub_id], columns=[f'{role}_{d}' for d in dims]))
+                sub_ratings.append(pd.concat(ratings, axis=1))
+            self.ratings = pd.concat(sub_ratings, axis=0)
             rating_dims = np.unique([c.split('_')[1] for c in self.ratings.columns])
 
-        elif utils.substring_in_strings('judgments', self.data.columns):
+        elif len(self.plan['judgments']):
             if self.verbose: print('Processing ratings')
 
-            rating_cols = utils.get_strings_matching_pattern(self.data.columns, 'judgments_*_resp')
-            if len(self.data[rating_cols]): ratings = self.data[rating_cols].iloc[0,:].values.astype(int).reshape(1,-1)
-            else:                           ratings = self.data[rating_cols].values.astype(int).reshape(1,-1)
+            rating_cols = self.columns('judgments_resp')
+            ratings = self.data[rating_cols].values
+            try:               ratings = ratings.astype(int)
+            except ValueError: ratings = ratings.astype(float) # a participant w/o ratings
             rating_cols  = [utils.remove_multiple_strings(c, ['judgments_','_resp']) for c in rating_cols]
-            self.ratings = pd.DataFrame(ratings, index=[self.sub_id], columns=rating_cols)
+            self.ratings = pd.DataFrame(ratings, index=self.sub_ids, columns=rating_cols)
             rating_dims  = np.unique([c.split('_')[1] for c in rating_cols]) 
             
         else:
@@ -680,221 +1365,216 @@ class ParseCsv:
 
     def process_forced_choice(self):
 
-        if not utils.substring_in_strings('forced_choice', self.data.columns): 
+        if not len(self.plan['forced_choice']): 
             if self.verbose: print('There are no forced choice columns in the csv')
             return
         else:
             if self.verbose: print('Processing forced choice')
-            choices = self.data[[c for c in self.data.columns if 'forced_choice' in c]]
+            choices = self.data.iloc[:, self.plan['forced_choice']]
             n_choices = int(len(choices.columns) / 3) # 3 cols for each trial
-
-            self.forced_choice = pd.DataFrame()
-            for t in np.arange(0, n_choices):
-
-                options = choices[f'forced_choice_{t}_comparison'].values[0].split('_&_')
-                rt      = float(choices[f'forced_choice_{t}_rt'].values[0])
-
-                # organize the responses
-                resp    = float(choices[f'forced_choice_{t}_resp'].values[0]) - 50 # center
-                if resp < 0: choice = options[0]
-                else:        choice = options[1]
-
-                ans                   = np.array([0, 0])
-                options               = sorted(options)
-                ans_ix                = options.index(choice)
-                ans[ans_ix]           = np.abs(resp)
-                ans[np.abs(ans_ix-1)] = -np.abs(resp)
-
-                self.forced_choice.loc[0, [f'{options[0]}_v_{options[1]}_{options[0]}']] = ans[0]
-                self.forced_choice.loc[0, [f'{options[0]}_v_{options[1]}_{options[1]}']] = ans[1]   
-                self.forced_choice.loc[0, [f'{options[0]}_v_{options[1]}_reaction_time']] = rt
-
-            self.forced_choice.index = [self.sub_id]
+            trials  = [f'forced_choice_{t}' for t in np.arange(0, n_choices)]
+
+            options = choices[[f'{t}_comparison' for t in trials]].values.astype(str)
+            rts     = choices[[f'{t}_rt' for t in trials]].values.astype(float)
+            resps   = choices[[f'{t}_resp' for t in trials]].values.astype(float) - 50 # center
+
+            # organize the responses: the chosen option gets the distance from the center (in whole points), the other its negative
+            option1 = np.char.partition(options, '_&_')[..., 0]
+            option2 = np.char.partition(options, '_&_')[..., 2]
+            choice  = np.where(resps < 0, option1, option2)
+            first   = np.where(option2 < option1, option2, option1) # alphabetically sorted
+            second  = np.where(option2 < option1, option1, option2)
+            ans     = np.where(choice == first, 1, -1) * np.trunc(np.abs(resps)) + 0.0 # no negative zeros
+
+            # one column per comparison, in order of appearance: a repeated comparison keeps its last trial
+            comparison = np.char.add(np.char.add(first, '_v_'), second)
+            cols    = np.stack([np.char.add(np.char.add(comparison, '_'), first), 
+                                np.char.add(np.char.add(comparison, '_'), second), 
+                                np.char.add(comparison, '_reaction_time')], axis=2)
+            values  = np.stack([ans, -ans + 0.0, rts], axis=2)
+            long_   = pd.DataFrame({'row': np.repeat(np.arange(len(self.data)), cols[0].size), 
+                                    'col': cols.ravel(), 'value': values.ravel()}).drop_duplicates(['row', 'col'], keep='last')
+            self.forced_choice = long_.pivot(index='row', columns='col', values='value').reindex(columns=pd.unique(cols.ravel()))
+
+            self.forced_choice.index = self.sub_ids
             self.forced_choice.columns = ['forced_choice_' + c for c in self.forced_choice.columns]
                 
             return self.forced_choice
 
     def process_schema_judgments(self):
-        if not utils.substring_in_strings('schema', self.data.columns):
+        if not len(self.plan['schema']):
             if self.verbose: print('There are no schema columns in the csv')
             return 
         else:
-            self.schema = self.data[[c for c in self.data.columns if ('schema' in c) & ('resp' in c)]]
+            self.schema = self.data.iloc[:, self.plan['schema_resp']]
             self.schema.columns = [f"{('_').join(c.split('_')[4:6])}" for c in self.schema.columns]
-            self.schema.index = [self.sub_id]
+            self.schema.index = self.sub_ids
             return self.schema
 
     def process_trust_game(self):
 
         #TODO: add share estimate task...
-        if not utils.substring_in_strings('trust', self.data.columns):
+        if not len(self.plan['trust']):
             if self.verbose: print('There are no trust game columns in the csv')
             return 
-        else:
-            try: 
-                # trust ratings
-                pre_ratings = self.data[[c for c in self.data.columns if ('snt_trust_ratings_pre' in c) & ('resp' in c)]]
-                pre_ratings.columns = [f"{c.split('_')[4]}_trust_pre" for c in pre_ratings.columns]
+        else: 
+            n_subs = len(self.data)
 
-                post_ratings = self.data[[c for c in self.data.columns if ('snt_trust_ratings_post' in c) & ('resp' in c)]]
-                post_ratings.columns = [f"{c.split('_')[4]}_trust_post" for c in post_ratings.columns]
-                
-                # share decisions
-                data, cols = [], []
-                other, first, comp = 1, 1, 1
-                trust_partner = self.data['trust_partner'].values[0]
-                trust_cols    = [c for c in self.data.columns if ('trust_game_round' in c)]
-                n_rounds = len(np.unique([c.split('_')[2] for c in trust_cols]))
-                n_trials = len(np.unique([c.split('_')[3] for c in trust_cols]))
-                for round_ in range(1,n_rounds+1): 
-                    for trial in range(1,n_trials+1):
-                        trial   = f'trust_game_round{round_:02d}_trial{trial:02d}'
-
-                        partner = self.data[f'{trial}_partner'].values[0]
-                        choice  = self.data[f'{trial}_choice'].values[0]
-                        rt      = self.data[f'{trial}_rt'].values[0]
-                        outcome = self.data[f'{trial}_outcome'].values[0]
-                        
-                        data.append(choice)
-                        data.append(rt)
-                        data.append(outcome)
-
-                        if partner.lower()==trust_partner.lower():
-                            cols.append(f'trust_round{round_:02d}_other0{other}_choice')
-                            cols.append(f'trust_round{round_:02d}_other0{other}_rt')
-                            cols.append(f'trust_round{round_:02d}_other0{other}_outcome')
-                            other = other + 1
-                        elif 'computer' in partner:
-                            cols.append(f'trust_round{round_:02d}_computer0{comp}_choice')
-                            cols.append(f'trust_round{round_:02d}_computer0{comp}_rt')
-                            cols.append(f'trust_round{round_:02d}_computer0{comp}_outcome')
-                            comp = comp + 1
-                        else:
-                            cols.append(f'trust_round{round_:02d}_first0{first}_choice')
-                            cols.append(f'trust_round{round_:02d}_first0{first}_rt')
-                            cols.append(f'trust_round{round_:02d}_first0{first}_outcome')
-                            first = first + 1
-
-                trust_game = pd.DataFrame(np.array(data)[np.newaxis], columns=cols)
-                self.trust = pd.concat([pre_ratings, trust_game, post_ratings], axis=1)
-                self.trust.insert(0, 'trust_game_bonus_amount', self.data['trust_game_bonus_amount'].values[0])
-                
-                # share estimate task
-                est_cols = [c for c in self.data.columns if 'estimate' in c] # chck if cols
-                if len(est_cols) > 0: 
-                    est_data = []
-                    for partner in ['first', 'computer']:
-                        part_cols = [c for c in est_cols if partner in c]
-                        rt   = self.data[[c for c in part_cols if 'rt' in c]].values[0][0]
-                        resp = self.data[[c for c in part_cols if 'resp' in c]].values[0][0]
-                        est_data.extend([rt, resp])
-                        
-                    est_data = pd.DataFrame(np.array(est_data)[np.newaxis], columns=['share_estimate_rt_first', 'share_estimate_first', 
-                                                                                     'share_estimate_rt_computer', 'share_estimate_computer'])
-                    
-                    # merge it all
-                    self.trust = pd.concat([self.trust, est_data], axis=1)
+            # trust ratings
+            pre_ratings = self.data.iloc[:, self.plan['trust_pre']]
+            pre_ratings.columns = [f"{c.split('_')[4]}_trust_pre" for c in pre_ratings.columns]
+
+            post_ratings = self.data.iloc[:, self.plan['trust_post']]
+            post_ratings.columns = [f"{c.split('_')[4]}_trust_post" for c in post_ratings.columns]
+            
+            # share decisions: (subs x trials x fields), trials in order of round & trial
+            trials = {}
+            for pos, col in zip(self.plan['trust_game'], self.columns('trust_game')):
+                match = trust_game_regex.match(col)
+                if match is not None: trials[(int(match['round']), int(match['trial']), match['field'])] = pos
+            rounds_trials = sorted({(r, t) for r, t, _ in trials})
+            fields = ['partner', 'choice', 'rt', 'outcome']
+            pos    = np.array([[trials.get((r, t, f), -1) for f in fields] for r, t in rounds_trials], dtype=int).reshape(-1, len(fields))
+            game   = np.full((n_subs,) + pos.shape, np.nan, dtype=object)
+            game[:, pos >= 0] = self.data.iloc[:, pos[pos >= 0]].values
+
+            # partners: the trust partner, a computer, or the first character; numbered in order across rounds
+            partners = np.char.lower(game[..., 0].astype(str))
+            if 'trust_partner' in self.data.columns: trust_partner = np.char.lower(self.data['trust_partner'].values.astype(str))
+            else:                                    trust_partner = np.full(n_subs, None)
+            is_other = partners == trust_partner[:, np.newaxis]
+            is_comp  = ~is_other & (np.char.find(partners, 'computer') >= 0)
+            kind     = np.select([is_other, is_comp], ['other', 'computer'], 'first')
+            number   = np.select([is_other, is_comp], [np.cumsum(is_other, axis=1), np.cumsum(is_comp, axis=1)], 
+                                 np.cumsum(~is_other & ~is_comp, axis=1))
+            rounds   = np.array([f'trust_round{r:02d}_' for r, _ in rounds_trials], dtype=object)
+            trial_cols = rounds + kind.astype(object) + '0' + number.astype(str).astype(object)
+
+            # wide: one column per partner & field, in order of appearance 
+            cols   = np.stack([trial_cols + f'_{f}' for f in fields[1:]], axis=2)
+            long_  = pd.DataFrame({'row': np.repeat(np.arange(n_subs), cols[0].size), 
+                                   'col': cols.ravel(), 'value': game[..., 1:].ravel()}).drop_duplicates(['row', 'col'], keep='last')
+            trust_game = long_.pivot(index='row', columns='col', values='value').reindex(index=np.arange(n_subs), columns=pd.unique(cols.ravel()))
+            trust_game = trust_game.apply(pd.to_numeric, errors='coerce') # choices, rts & outcomes are all numeric
+            trust_game.columns.name, trust_game.index = None, pre_ratings.index
+            
+            self.trust = pd.concat([pre_ratings, trust_game, post_ratings], axis=1)
+            if 'trust_game_bonus_amount' in self.data.columns:
+                self.trust.insert(0, 'trust_game_bonus_amount', self.data['trust_game_bonus_amount'].values)
+            
+            # share estimate task
+            est_cols = self.columns('estimate') # chck if cols
+            if len(est_cols) > 0: 
+                est_data = {}
+                for partner in ['first', 'computer']:
+                    part_cols = [c for c in est_cols if partner in c]
+                    for name, field in [(f'share_estimate_rt_{partner}', 'rt'), (f'share_estimate_{partner}', 'resp')]:
+                        field_cols = [c for c in part_cols if field in c]
+                        est_data[name] = self.data[field_cols[0]].values if len(field_cols) else np.nan
+                est_data = pd.DataFrame(est_data, index=self.trust.index).apply(pd.to_numeric, errors='coerce') # rts & estimates
                     
-                self.trust.index = [self.sub_id]
-                return self.trust
-            except:
-                return 
+                # merge it all
+                self.trust = pd.concat([self.trust, est_data], axis=1)
+                
+            self.trust.index = self.sub_ids
+            return self.trust
     
     def process_realworld(self):
 
-        if not utils.substring_in_strings('realworld_relationships', self.data.columns):
+        if not len(self.plan['realworld']):
             if self.verbose: print('There are no realworld relationships columns in the csv')   
             return 
         else:
-            network_div, network_num, relationships, people = [], [], [], []
-
             categories = ['marriage', 'dating', 'children', 'parents', 'inlaws', 'relatives', 'friends', 'religion', 'school',
                           'work', 'work_supervision', 'work_nonsupervision', 'neighbors', 'volunteer',
                           'extra_group1', 'extra_group2', 'extra_group3', 'extra_group4', 'extra_group5'] 
             rating_cols = ['time_known', 'frequency', 'similarity', 'likability', 'impact',  # this may vary across colletions...?
                            'popularity', 'competence', 'friendliness', 'dominance', 
                            'dots_affil', 'dots_power']
-                    
-            for cat in categories:
-
-                try:
-                   
-                    num_ppl_ = int(self.data[f'realworld_relationships_{cat}_number_of_people_value'].values[0])
-                    if num_ppl_ == 0:
-                        network_div.append(0)
-                        network_num.append(0)                       
-                    elif cat == 'dating':
-                        if (num_ppl_ == 1):
-                            network_div.append(1)
-                            network_num.append(1)
-                        elif (num_ppl_ == 3): 
-                            network_div.append(1)
-                            network_num.append(2)
-                        elif (num_ppl_ == 2) or (num_ppl_ == 4): 
-                            network_div.append(0)
-                            network_num.append(0) 
-                    else: # not dating
-                        if math.isnan(num_ppl_):
-                            network_num.append(0)
-                            network_div.append(0)
-                        else:
-                            network_num.append(num_ppl_)
-                            if (num_ppl_ != 0): network_div.append(1)
-                            else:               network_div.append(0)
-
-                    if num_ppl_ > 0:
-                        for n in range(num_ppl_):
-                            
-                            person = f'realworld_relationships_{cat}_people_{n}'
-                            ratings = self.data[[f'{person}_{col}' for col in rating_cols]].values[0].astype(int)
-                            relationships.extend(list(ratings))     
-                            people.append(f'{cat}_{n+1:02d}')     
-                            
-
-                except: 
-                    network_num.append(0)
-                    network_div.append(0)
-
-            sni_df = pd.DataFrame(np.array([np.sum(network_num), np.sum(network_div)])[np.newaxis], 
-                                  columns=['sni_number_ppl', 'sni_network_diversity'])
-            realworld_df = pd.DataFrame(np.array(relationships)[np.newaxis],
-                                        columns=np.array([[f'{p}_{col}' for col in rating_cols] for p in people]).flatten())
-            realworld_df[[c for c in realworld_df if 'affil' in c]] = (realworld_df[[c for c in realworld_df if 'affil' in c]] - 500) / 500
-            realworld_df[[c for c in realworld_df if 'power' in c]] = (500 - realworld_df[[c for c in realworld_df if 'power' in c]]) / 500
+            n_subs = len(self.data)
+
+            # find the number of people & people's ratings columns, in one pass
+            num_pos, person_pos = {}, {}
+            for pos, col in zip(self.plan['realworld'], self.columns('realworld')):
+                match = realworld_regex.match(col)
+                if match is None: continue
+                if match['person'] is None: num_pos[match['cat']] = pos
+                else:                       person_pos[(match['cat'], int(match['person']), match['rating'])] = pos
+
+            # number of people in each category: (subs x categories), nan if missing or not a number 
+            num_ppl = np.full((n_subs, len(categories)), np.nan)
+            has_num = [c for c, cat in enumerate(categories) if cat in num_pos]
+            num_ppl[:, has_num] = np.trunc(_to_float(self.data.iloc[:, [num_pos[categories[c]] for c in has_num]].values))
+
+            # social network index: dating counts as 1 category w/ 1 (response 1) or 2 people (response 3), or none (responses 2 & 4)
+            num_ = np.nan_to_num(num_ppl, nan=0)
+            dating = np.array(categories) == 'dating'
+            network_num = np.where(dating, np.select([num_ == 1, num_ == 3], [1, 2], 0), num_)
+            network_div = np.where(dating, np.isin(num_, [1, 3]), num_ != 0)
+            sni_df = pd.DataFrame({'sni_number_ppl': network_num.sum(axis=1).astype(int), 
+                                   'sni_network_diversity': network_div.sum(axis=1).astype(int)})
+
+            # ratings: (subs x people x ratings), for all the people w/ columns
+            n_people = {cat: max([n + 1 for (c, n, _) in person_pos if c == cat], default=0) for cat in categories}
+            people   = [(cat, n) for cat in categories for n in range(n_people[cat])]
+            pos      = np.array([[person_pos.get((cat, n, r), -1) for r in rating_cols] for cat, n in people], dtype=int).reshape(-1, len(rating_cols))
+            ratings  = np.full((n_subs,) + pos.shape, np.nan)
+            ratings[:, pos >= 0] = np.trunc(_to_float(self.data.iloc[:, pos[pos >= 0]].values))
+
+            # a category's people are kept up to its number of people, & until one has missing ratings
+            cat_ix   = np.array([categories.index(cat) for cat, _ in people], dtype=int)
+            person_n = np.array([n for _, n in people], dtype=int)
+            complete = ~np.any(np.isnan(ratings), axis=2)
+            for c in np.unique(cat_ix):
+                complete[:, cat_ix == c] = np.cumprod(complete[:, cat_ix == c], axis=1).astype(bool)
+            keep = complete & (person_n < num_ppl[:, cat_ix]) # nan number of people keeps none
+
+            # wide: the people anyone has, w/ the dots rescaled
+            ratings[~keep] = np.nan
+            ratings[..., rating_cols.index('dots_affil')] = (ratings[..., rating_cols.index('dots_affil')] - 500) / 500
+            ratings[..., rating_cols.index('dots_power')] = (500 - ratings[..., rating_cols.index('dots_power')]) / 500
+            kept    = np.any(keep, axis=0)
+            columns = [f'{cat}_{n+1:02d}_{col}' for cat, n in np.array(people, dtype=object)[kept] for col in rating_cols]
+            values  = ratings[:, kept].reshape(n_subs, -1)
+            is_int  = ~np.any(np.isnan(values), axis=0) & np.tile(['dots' not in col for col in rating_cols], kept.sum()) # ratings stay integers
+            realworld_df = pd.DataFrame({col: (v.astype(int) if i else v) for col, v, i in zip(columns, values.T, is_int)}, 
+                                        columns=columns)
 
             # put together
             self.relationships = pd.concat([sni_df, realworld_df], axis=1)
-            self.relationships.index = [self.sub_id]
+            self.relationships.index = self.sub_ids
             return self.relationships
         
     def process_free_response(self):
 
-        if not utils.substring_in_strings('free_response', self.data.columns):
+        if not len(self.plan['free_response']):
             if self.verbose: print('There are no free responses in the csv')   
             return 
         else:
-            self.free_response = self.data[[c for c in self.data.columns if 'free_response' in c]]
+            self.free_response = self.data.iloc[:, self.plan['free_response']]
             if len(self.free_response.columns) > 1: # multiple characters - diff format
                 self.free_response.columns = [f"free_response_{c.split('_')[3]}" for c in self.free_response.columns] 
-            self.free_response.index = [self.sub_id]
+            self.free_response.index = self.sub_ids
             return self.free_response           
 
     def process_questions(self):
 
-        if not utils.substring_in_strings('questions', self.data.columns):
+        if not len(self.plan['questions']):
             if self.verbose: print('There are no storyline/behavioral questions in the csv')   
             return 
         else:
-            ques_cols = [c for c in self.data.columns if 'questions' in c]
+            ques_cols = self.columns('questions')
             
             if len(ques_cols) == 1: # older version
                 
-                end_questions = self.data['end_questions'].values[0].split(';')
-                qs, ans = [], []
-                for ques in end_questions:
-                    qs.append(utils.remove_nontext(ques.split(':')[0]))
-                    ans.append(re.sub('[\[\]"]', '', ques.split(':')[1]))
-                self.questions = pd.DataFrame(np.array(ans)[np.newaxis], columns=[f'storyline_{q}' for q in qs])  
+                questions = []
+                for end_questions in self.data['end_questions'].values:
+                    qs, ans = [], []
+                    for ques in end_questions.split(';'):
+                        qs.append(utils.remove_nontext(ques.split(':')[0]))
+                        ans.append(re.sub('[\[\]"]', '', ques.split(':')[1]))
+                    questions.append(pd.DataFrame(np.array(ans)[np.newaxis], columns=[f'storyline_{q}' for q in qs]))
+                self.questions = pd.concat(questions, axis=0)
                 self.questions['storyline_engagement'] = self.questions['storyline_engagement'].astype(int)
                 self.questions['storyline_difficulty']  = self.questions['storyline_difficulty'].astype(int)
                 self.questions['storyline_relatability'] = self.questions['storyline_relatability'].astype(int)
@@ -903,41 +1583,131 @@ class ParseCsv:
                 self.questions = self.data[ques_cols]
                 self.questions.columns = [c.replace('_questions', '') for c in self.questions.columns]
                 
-            self.questions.index = [self.sub_id]
+            self.questions.index = self.sub_ids
             return self.questions
 
     def process_iq(self):
         
-        if (not utils.substring_in_strings('iq_mx47', self.data.columns)) and (not utils.substring_in_strings('iq', self.data.columns)):
+        if not len(self.plan['iq']):
             if self.verbose: print('There are no iq columns in the csv')   
             return 
         else:
-            if utils.substring_in_strings('iq_mx47', self.data.columns): # newer
-                iq_ques = [q.split('_')[1] for q in [c for c in self.data.columns if ('iq' in c) & ('resp' in c)]]
-                iq_resp = self.data[[c for c in self.data.columns if ('iq' in c) & ('resp' in c)]].values[0]
-                iq_ques = [q.lower() for q in iq_ques]
-                iq_resp = [r.lower() for r in iq_resp]
-            elif utils.substring_in_strings('iq', self.data.columns):
-                iqs = self.data['iq'].values[0].split('","')
-                iq_ques = [re.sub(r'[["]', "", iq.split(';')[0]) for iq in iqs]
-                iq_resp = [iq.split(';')[1].split('resp:')[1] for iq in iqs]
+            # each participant's questions & responses, in one list
+            if len(self.plan['iq_mx47']): # newer
+                iq_ques = [q.split('_')[1].lower() for q in self.columns('iq_resp')]
+                iq_ques = np.tile(iq_ques, len(self.data))
+                # - numeric responses are kept as numbers: whole numbers as ints, eg 5.0 if a blank made the column float
+                iq_resp = self.data.iloc[:, self.plan['iq_resp']]
+                numeric = iq_resp.apply(pd.to_numeric, errors='coerce')
+                whole   = numeric.notnull() & (numeric % 1 == 0)
+                iq_resp = iq_resp.astype(str).mask(whole, numeric.where(whole, 0).astype('int64').astype(str))
+                iq_resp = np.char.lower(iq_resp.values.astype(str)).ravel()
+                sub_ix  = np.repeat(np.arange(len(self.data)), len(self.plan['iq_resp']))
+            else:
+                iq_ques, iq_resp, sub_ix = [], [], []
+                for r, iq in enumerate(self.data['iq'].values):
+                    iqs = iq.split('","')
+                    iq_ques.extend([re.sub(r'[\["]', "", iq.split(';')[0]) for iq in iqs])
+                    iq_resp.extend([iq.split(';')[1].split('resp:')[1] for iq in iqs])
+                    sub_ix.extend([r] * len(iqs))
             
-            answers =  [["vr4",'5'],["vr16","its"],["vr17",'47'],["vr19","sunday"],
-                        ["ln7","x"],["ln33","g"],["ln34","x"],["ln58","n"],
-                        ["mx45","e"],["mx46","b"],["mx47","b"],["mx55","d"],
-                        ["r3d3","c"],["r3d4","b"],["r3d6","f"],["r3d8","g"]]
-            iq_correct = np.zeros(len(answers))
-            for answer in answers: 
-                for (q,ques), resp in zip(enumerate(iq_ques), iq_resp):
-                    if (ques == answer[0]) & (resp == str(answer[1])):
-                        iq_correct[q] = 1
-            self.iq = pd.DataFrame(np.mean(iq_correct)[np.newaxis], columns=['iq_score'])
-            self.iq.index = [self.sub_id]
+            # score against the key
+            answers    = np.array([iq_answers.get(q) for q in iq_ques], dtype=object)
+            iq_correct = np.array(iq_resp, dtype=object) == answers
+            self.iq = pd.DataFrame(np.bincount(sub_ix, weights=iq_correct, minlength=len(self.data)) / len(iq_answers), columns=['iq_score'])
+            self.iq.index = self.sub_ids
             return self.iq
         
 
+def number_repeated_columns(df):
+    ''' 
+        number repeated column headers like pd.read_csv ('col', 'col.1', ...), so posttask tables can be stacked 
+        eg older versions rate 'gender', which repeats the characters' gender columns
+    '''
+    repeat = df.columns.to_series().groupby(level=0).cumcount().values
+    df.columns = [f'{c}.{r}' if r else c for c, r in zip(df.columns, repeat)]
+    return df
+
+
+class ParseCohortCsv:
+
+    def __init__(self, csv_paths, snt_version='standard', verbose=0):
+        '''
+            Parse online snt csvs w/ one participant per row (eg a platform export), all participants at once
+
+            Arguments
+            ---------
+            csv_paths : str or list of str
+                Path(s) to csvs; the date is taken from a 'date' column, or else from the filename (see ParseCsv)
+            snt_version : str (optional, default='standard')
+                'standard', 'schema' or 'adolescent_pilot'
+            verbose : int (optional, default=0)
+
+            Attributes
+            ----------
+            groups : list of ParseCsv
+                One parser for each csv & task_ver: a group's rows share their columns & character names,
+                so each task is parsed column-wise over the whole group
+        '''
+
+        self.verbose = verbose
+        self.csvs    = [csv_paths] if isinstance(csv_paths, (str, Path)) else list(csv_paths)
+        self.groups  = []
+
+        sub_ids = []
+        for csv_path in self.csvs:
+            data = pd.read_csv(csv_path)
+            if (snt_version == 'adolescent_pilot') & ('initials' in data.columns): ids = data['initials']
+            elif 'prolific_id' in data.columns:                                  ids = data['prolific_id']
+            else: raise Exception(f'{csv_path} does not have a "prolific_id" column')
+
+            # a participant can be in the data more than once: keep their first row 
+            repeated = ids.duplicated().values | np.isin(ids.values, sub_ids)
+            if self.verbose & np.any(repeated): print(f'Skipping repeated rows for {np.unique(ids[repeated])}')
+            data = data[~repeated]
+            sub_ids.extend(ids[~repeated])
+
+            for _, rows in data.groupby('task_ver', sort=False):
+                self.groups.append(ParseCsv(csv_path, snt_version=snt_version, verbose=verbose, data=rows, cohort=True))
+        self.sub_ids = sub_ids
+
+    def run(self, compact=True):
+        '''
+            Arguments
+            ---------
+            compact : bool (optional, default=True)
+                Coerce the outputs to the data dictionary's dtypes, eg categoricals & int8 (see info.coerce_dtypes)
+
+            Returns
+            -------
+            list of pd.DataFrame
+                snt: long format, one row per participant & decision, w/ a prolific_id column 
+                post: wide format, one row per participant, indexed by prolific_id
+        '''
+        snt, post = [], []
+        for group in self.groups:
+            snt_, post_ = group.run()
+            if snt_ is not None: snt.append(snt_)
+
+            post.append(number_repeated_columns(post_))
+
+        if len(snt): # in the order of the csvs' rows, like post
+            self.snt = pd.concat(snt, ignore_index=True)
+            order    = pd.Index(self.sub_ids).get_indexer(self.snt['prolific_id'])
+            self.snt = self.snt.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+        else:
+            self.snt = None
+        self.post = pd.concat(post, axis=0).reindex(self.sub_ids)
+        self.post.index.name = 'prolific_id'
+
+        if compact: # after concatenating, so categoricals span the cohort
+            if self.snt is not None: self.snt = info.coerce_dtypes(self.snt)
+            self.post = info.coerce_dtypes(self.post)
+        return [self.snt, self.post]
+
+
 # - convenience function
-def parse_csv(file_path, snt_version='standard', verbose=0, out_dir=None):
+def parse_csv(file_path, snt_version='standard', verbose=0, out_dir=None, fmt=None, cache=True):
 
     # out directories
     if out_dir is None: out_dir = Path(os.getcwd())
@@ -955,21 +1725,131 @@ def parse_csv(file_path, snt_version='standard', verbose=0, out_dir=None):
         print('Creating subdirectory for organized post task data')
         os.makedirs(post_dir)   
 
+    # skip if already parsed w/ the same contents & parameters
+    if fmt is None: fmt = utils.default_table_format # the cache records the format actually written
+    params = {'snt_version': snt_version, 'fmt': fmt}
+    if cache:
+        cached = check_cache(out_dir, 'parse_csv', file_path, params)
+        if cached is not None:
+            if verbose: print(f'{Path(file_path).name}: csv & parameters unchanged; using cached outputs')
+            return cached[1] if len(cached) > 1 else None
+
     # parse file
     parser = ParseCsv(file_path, snt_version=snt_version, verbose=verbose)
     snt, post = parser.run()
-    post.to_excel(Path(f'{post_dir}/SNT-posttask_{parser.sub_id}.xlsx'), index=True)
-    try: # may not have snt data
-        out_snt_fname = str(Path(f'{snt_dir}/SNT_{parser.sub_id}.xlsx')) # main behavioral filename
-        snt.to_excel(out_snt_fname, index=False)
-        return out_snt_fname
-    except:
-        return 
-    
+    out_fnames = [utils.write_table(post, f'{post_dir}/SNT-posttask_{parser.sub_id}', fmt=fmt, index=True)]
+    if snt is None: # may not have snt data
+        out_snt_fname = None
+    else:
+        out_snt_fname = utils.write_table(snt, f'{snt_dir}/SNT_{parser.sub_id}', fmt=fmt) # main behavioral filename
+        out_fnames.append(out_snt_fname)
+    if cache: update_cache(out_dir, 'parse_csv', file_path, params, out_fnames)
+    return out_snt_fname
+
+
+def _init_csv_worker(decision_trials, validated_decisions, output_schema):
+    ''' pre-warm a worker process w/ the reference tables ParseCsv uses, from the parent, so they are not reloaded '''
+    info.decision_trials     = decision_trials
+    info.validated_decisions = validated_decisions
+    info.output_schema       = output_schema
+
+
+def _csv_job(file_path, snt_version='standard'):
+    ''' parse one csv in memory, w/ any error recorded instead of raised '''
+    job = {'file_path': str(file_path), 'sub_id': None, 'snt': None, 'post': None, 'duration': np.nan, 'error': None}
+    start = time.perf_counter()
+    try:
+        parser = ParseCsv(file_path, snt_version=snt_version)
+        job['sub_id'] = parser.sub_id
+        job['snt'], job['post'] = parser.run()
+    except Exception:
+        job['error'] = traceback.format_exc(limit=3)
+    job['duration'] = time.perf_counter() - start
+    return job
+
+
+def parse_csvs(file_paths, snt_version='standard', out_dir=None, fmt=None, n_jobs=None, compact=True):
+    '''
+        Parse a batch of online csvs in parallel, into 2 tables for everyone (see ParseCsv)
+        Instead of 2 files per participant, as parse_csv writes
 
+        Each participant's errors are isolated: a failed csv is recorded in the manifest & the rest carry on
+
+        Arguments
+        ---------
+        file_paths : str or list of str
+            Directory of '*.csv' files, or list of csv file paths
+        snt_version : str (optional, default='standard')
+            'standard', 'schema' or 'adolescent_pilot'
+        out_dir : str (optional, default=None)
+            Specify the output directory
+        fmt : str (optional, default=None)
+            Output table format (see utils.write_table); None uses utils.default_table_format
+        n_jobs : int (optional, default=None)
+            Number of worker processes; None uses all cores, 1 runs in this process
+        compact : bool (optional, default=True)
+            Coerce snt & post to the data dictionary's dtypes, eg categoricals & int8 (see info.coerce_dtypes)
+
+        Returns
+        -------
+        snt : pd.DataFrame
+            long format: one row per participant & decision, w/ a sub_id column
+        post : pd.DataFrame
+            wide format: one row per participant, indexed by sub_id
+        manifest : pd.DataFrame
+            file path, sub id, number of snt trials, duration (s) & error for each csv
+        
+        All three are also written to out_dir, as SNT_trials, SNT-posttask & SNT-csvs_manifest
+    '''
 
+    file_paths = _list_files(file_paths, '*.csv')
+    if out_dir is None: out_dir = Path(os.getcwd())
+    os.makedirs(out_dir, exist_ok=True)
 
-    # process misc qs
+    if n_jobs is None: n_jobs = os.cpu_count()
+    n_jobs = max(1, min(n_jobs, len(file_paths)))
+    if n_jobs == 1:
+        jobs = [_csv_job(f, snt_version) for f in file_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_csv_worker, 
+                                 initargs=(info.decision_trials, info.validated_decisions, info.output_schema)) as executor:
+            jobs = list(executor.map(_csv_job, file_paths, [snt_version] * len(file_paths), 
+                                     chunksize=max(1, len(file_paths) // (n_jobs * 4))))
+
+    # merge: a participant's first csv is kept
+    snt, post, parsed = [], [], {}
+    for job in jobs:
+        if job['error'] is None:
+            if job['sub_id'] in parsed:
+                job['error'], job['snt'] = f"{job['sub_id']} was already parsed from {parsed[job['sub_id']]}", None
+                continue
+            parsed[job['sub_id']] = job['file_path']
+            if job['snt'] is not None: 
+                snt.append(job['snt'].assign(sub_id=job['sub_id']))
+            post.append(number_repeated_columns(job['post']))
+    
+    if len(snt):
+        snt = pd.concat(snt, ignore_index=True)
+        snt = snt[['sub_id'] + [c for c in snt.columns if c != 'sub_id']]
+    else:
+        snt = None
+    post = pd.concat(post, axis=0) if len(post) else None
+    if post is not None: post.index.name = 'sub_id'
+    if compact:
+        if snt is not None:  snt  = info.coerce_dtypes(snt)
+        if post is not None: post = info.coerce_dtypes(post)
+
+    manifest = pd.DataFrame(jobs, columns=['file_path', 'sub_id', 'snt', 'duration', 'error'])
+    manifest['n_trials'] = [0 if t is None else len(t) for t in manifest.pop('snt')]
+    manifest = manifest[['file_path', 'sub_id', 'n_trials', 'duration', 'error']]
+
+    # write
+    if snt is not None:  utils.write_table(snt, f'{out_dir}/SNT_trials', fmt=fmt)
+    if post is not None: utils.write_table(post, f'{out_dir}/SNT-posttask', fmt=fmt, index=True)
+    utils.write_table(manifest, f'{out_dir}/SNT-csvs_manifest', fmt=fmt)
+    n_failed = manifest['error'].notnull().sum()
+    if n_failed: print(f'{n_failed} of {len(manifest)} csvs failed; see the manifest')
+    return snt, post, manifest
 
 
 def merge_choice_data(choice_data, decision_cols=None):
@@ -1001,10 +1881,14 @@ def merge_choice_data(choice_data, decision_cols=None):
 
 
 def process_dots(img_fname):
+    from PIL import Image
     img = Image.open(img_fname)
     return define_char_coords(img)
 
 def get_dot_coords(img, plot=False):
+
+    from sklearn.feature_extraction import image
+    from sklearn.cluster import spectral_clustering
     
     with warnings.catch_warnings():
         
@@ -1034,6 +1918,7 @@ def get_dot_coords(img, plot=False):
     
     if plot:
 
+        import matplotlib.pyplot as plt
         plt.imshow(dot_im, cmap=plt.cm.nipy_spectral, interpolation='nearest')
         plt.show()
     
@@ -1092,6 +1977,7 @@ def define_char_coords(img):
                  character_maps['newcomb'] + character_maps['hayworth'] + 
                  character_maps['anthony'] + character_maps['kayce'])
     recon_img = np.where(recon_img==[0,0,0], [255,255,255], recon_img).astype(np.uint8)
+    from PIL import Image
     recon_img = Image.fromarray(recon_img)
 
     # dataframe
@@ -1107,6 +1993,133 @@ def define_char_coords(img):
 #------------------------------------------------------------------------------------------
 
 
+# - incremental convex hull
+class IncrementalHull:
+
+    def __init__(self, n_dims=2, tol=1e-9):
+        '''
+            Convex hull of a growing set of points, updated one point at a time (eg one per trial)
+
+            - 2D: a counterclockwise vertex list; a point outside the hull replaces the chain of edges it can see, 
+              & the perimeter & area are updated from those edges only
+            - 3D: points inside the current hull are skipped, the others are added w/ qhull's incremental mode (scipy);
+              if qhull fails on near-coplanar points, the hull is rebuilt from its vertices & the point
+            Until the points span the plane/space (eg < 3 points, or all collinear in 2D) there is no hull: 
+            the size is nan & the points are kept until they do
+
+            Arguments
+            ---------
+            n_dims : int (optional, default=2)
+                2 or 3
+            tol : float (optional, default=1e-9)
+                Points within tol (scaled by the hull's extent) of the hull are treated as on it
+
+            Attributes
+            ----------
+            vertices : np.ndarray or None
+                Hull vertices (2D: counterclockwise), None before there is a hull
+            size : np.ndarray
+                2D: perimeter & area; 3D: surface area & volume (like scipy's ConvexHull area & volume)
+            centroid : np.ndarray
+                2D only: the hull's area-weighted centroid; before there is a hull, the centroid of the points' 
+                degenerate hull: the point itself, or the midpoint of the segment the collinear points span
+        '''
+        if n_dims not in [2, 3]: raise Exception(f'IncrementalHull is for 2D or 3D points, not {n_dims}D')
+        self.n_dims  = n_dims
+        self.tol     = tol
+        self.points  = [] # before there is a hull
+        self._hull   = None # 2D: list of (x, y) vertices; 3D: scipy hull
+        self._size   = [np.nan, np.nan]
+        self._scale  = 1 # max absolute coordinate, for the tolerance
+        self._centroid = None # cached
+
+    @property
+    def vertices(self):
+        if self._hull is None:  return None
+        elif self.n_dims == 2:  return np.array(self._hull)
+        else:                   return self._hull.points[self._hull.vertices]
+
+    @property
+    def size(self):
+        return np.array(self._size)
+
+    @property
+    def centroid(self):
+        if self.n_dims != 2:    raise Exception('IncrementalHull.centroid is only implemented for 2D hulls')
+        if self._centroid is None: # recomputed only after the hull changes
+            if self._hull is not None: 
+                self._centroid = np.array(utils.polygon_centroid(self._hull))
+            elif len(self.points) == 0: 
+                self._centroid = np.array([np.nan, np.nan])
+            else: # collinear: the extremes are the lexicographic min & max
+                points = [tuple(p) for p in self.points]
+                self._centroid = (np.array(min(points)) + np.array(max(points))) / 2
+        return self._centroid.copy()
+
+    def add(self, point):
+        ''' add a point; returns whether the hull changed '''
+        point = [float(p) for p in point] # plain floats: numpy's overhead dominates for single points
+        self._scale = max(self._scale, *map(abs, point))
+        if self._hull is None:  changed = self._start(np.array(point))
+        elif self.n_dims == 2:  changed = self._add_2d(*point)
+        else:                   changed = self._add_3d(np.array(point))
+        if changed or (self._hull is None): self._centroid = None
+        return changed
+
+    def _start(self, point):
+        # a hull once the points span the plane/space
+        self.points.append(point)
+        points = np.array(self.points)
+        if (len(points) <= self.n_dims) or (np.linalg.matrix_rank(points[1:] - points[0]) < self.n_dims): 
+            return False
+        try:
+            hull = ConvexHull(points, incremental=(self.n_dims == 3))
+        except QhullError: # spans the space, but too thinly for qhull
+            return False
+        self.points = []
+        if self.n_dims == 2: self._hull = [tuple(v) for v in points[hull.vertices]] # counterclockwise in 2D
+        else:                self._hull = hull
+        self._size = [hull.area, hull.volume]
+        return True
+
+    def _add_2d(self, x, y):
+        # edges the point can see: it's to their right (outside) 
+        # - plain python: hulls have few vertices, so this beats numpy's per-call overhead
+        vertices, tol = self._hull, self.tol * self._scale ** 2
+        n_vertices = len(vertices)
+        cross = []
+        for v, (x0, y0) in enumerate(vertices):
+            x1, y1 = vertices[(v + 1) % n_vertices]
+            cross.append((x1 - x0) * (y - y0) - (y1 - y0) * (x - x0))
+        visible = [c < -tol for c in cross]
+        if not any(visible): return False # inside or on the hull
+
+        # the visible edges are a contiguous run (circularly): the vertices strictly inside it are replaced by the point
+        first = next(v for v in range(n_vertices) if visible[v] & (not visible[v - 1]))
+        n_visible = sum(visible)
+        run   = [(first + e) % n_vertices for e in range(n_visible)]
+        start, end = vertices[first], vertices[(first + n_visible) % n_vertices]
+
+        self._size[0] += math.hypot(x - start[0], y - start[1]) + math.hypot(end[0] - x, end[1] - y) \
+                         - sum(math.hypot(vertices[(e + 1) % n_vertices][0] - vertices[e][0], 
+                                          vertices[(e + 1) % n_vertices][1] - vertices[e][1]) for e in run)
+        self._size[1] -= sum(cross[e] for e in run) / 2
+        kept = [vertices[(first + n_visible + k) % n_vertices] for k in range(n_vertices - n_visible + 1)] # from the run's end to its start
+        self._hull = kept + [(x, y)]
+        return True
+
+    def _add_3d(self, point):
+        equations = self._hull.equations
+        if np.all(equations[:, :-1] @ point + equations[:, -1] <= self.tol * self._scale ** 2):
+            return False # inside or on the hull
+        try: 
+            self._hull.add_points(point[np.newaxis])
+        except QhullError:
+            self._hull = ConvexHull(np.vstack([self.vertices, point]), incremental=True)
+        self._size = [self._hull.area, self._hull.volume]
+        return True
+
+
 # TODO: create a key for the different variables
 class ComputeBehavior2:
 
@@ -1170,10 +2183,7 @@ class ComputeBehavior2:
                 
                 self.file_path = Path(file)
                 self.sub_id    = self.file_path.stem.split('_')[1] # expects a filename like 'snt_subid_*'
-                if self.file_path.suffix == '.xlsx':  self.data = copy.deepcopy(pd.read_excel(self.file_path, engine='openpyxl'))
-                elif self.file_path.suffix == '.xls': self.data = copy.deepcopy(pd.read_excel(self.file_path))
-                elif self.file_path.suffix == '.csv': self.data = copy.deepcopy(pd.read_csv(self.file_path))
-                else: raise Exception(f'File type {self.file_path.suffix} not recognized')
+                self.data      = utils.read_table(self.file_path) # format from the suffix
     
                 self.check_input(self.data, (63, self.data.shape[1])) # should have 63 trials
  
@@ -1360,13 +2370,14 @@ class ComputeBehavior2:
                             np.nancumsum(resp_mask, axis=0), dtype=float_dtype)
 
         elif which == 'circular':
-            means = np.zeros_like(values, dtype=float_dtype) 
-            for c in range(len(values)):
-                if resp_mask[c]: 
-                    if c == 0: means[c] = values[c]
-                    else:      means[c] = pycircstat.mean(values[:c+1])
-                else:            
-                    means[c] = means[c-1] # replace w/ previous value
+            # over all the values so far, incl. the non-responses (see utils.cumulative_circular_stats)
+            means, _, _ = utils.cumulative_circular_stats(values, axis=0)
+            means[0] = values[0]
+            
+            # non-responses carry the previous mean forward (0 before the 1st response)
+            resp_mask = np.broadcast_to(resp_mask, values.shape)
+            last_resp = np.maximum.accumulate(np.where(resp_mask, np.arange(len(values))[:, np.newaxis], -1), axis=0)
+            means     = np.where(last_resp >= 0, np.take_along_axis(means, np.maximum(last_resp, 0), axis=0), 0)
             return np.array(means, dtype=float_dtype)
 
     @staticmethod
@@ -1428,9 +2439,11 @@ class ComputeBehavior2:
         ''' returns vertices & polygon from a set of 2D coordinates
             can be convex or concave, controlled by alpha parameter
         '''
+        import alphashape
+        from shapely.geometry import Polygon, mapping
         hull   = alphashape.alphashape(np.array(coords), alpha) 
         hull_vertices = np.array(mapping(hull)['coordinates'][0])
-        return [geometry.Polygon(hull_vertices), hull_vertices]
+        return [Polygon(hull_vertices), hull_vertices]
 
     @staticmethod
     def calc_shape_size(coords, float_dtype="float32"):
@@ -1443,21 +2456,44 @@ class ComputeBehavior2:
         except:
             return np.array([np.nan, np.nan], dtype=float_dtype)
 
+    @staticmethod
+    def iter_cumulative_hulls(coords, start=None):
+        ''' the convex hull of coords[:1], coords[:2], ... as one IncrementalHull updated in place; start: points to begin w/ (eg the pov) '''
+        hull = IncrementalHull(coords.shape[1])
+        for point in ([] if start is None else start): 
+            hull.add(point)
+        for point in coords:
+            hull.add(point)
+            yield hull
+
+    @staticmethod
+    def calc_hull_quadrant_overlap(vertices, float_dtype="float32"):
+        ''' 
+            Proportion of a convex hull's area in each quadrant (Q1-Q4: 6x6 squares around the origin, counterclockwise from +affil, +power)
+            The hull is clipped to the quadrants' bounds, then split along the axes (Sutherland-Hodgman)
+            vertices: ordered hull vertices, eg IncrementalHull.vertices; None (no hull) gives nans
+        '''
+        if vertices is None: return np.full(4, np.nan, dtype=float_dtype)
+        polygon = [tuple(v) for v in vertices]
+        area    = utils.polygon_area(polygon)
+        for dim in [0, 1]:
+            polygon = utils.clip_polygon(utils.clip_polygon(polygon, dim, -6, keep='above'), dim, 6, keep='below')
+        right, left = utils.clip_polygon(polygon, 0, 0, keep='above'), utils.clip_polygon(polygon, 0, 0, keep='below')
+        quadrants   = [utils.clip_polygon(right, 1, 0, keep='above'), utils.clip_polygon(left, 1, 0, keep='above'), 
+                       utils.clip_polygon(left, 1, 0, keep='below'), utils.clip_polygon(right, 1, 0, keep='below')]
+        return np.array([utils.polygon_area(quadrant) / area for quadrant in quadrants], dtype=float_dtype)
+
     @staticmethod
     def calc_quadrant_overlap(coords, float_dtype="float32"):
-        quad_vertices = np.array([[[0,0], [6,0], [6,6],  [0,6]],
-                                  [[-6,0],[0,0], [0,6],  [-6,6]],
-                                  [[0,0], [-6,0],[-6,-6],[0,-6]],
-                                  [[6,0], [0,0], [0,-6], [6,-6]]])
         try: 
             convexhull = ConvexHull(coords)
-            polygon    = Polygon(coords[convexhull.vertices])
-            return np.array([polygon.intersection(Polygon(v)).area / polygon.area for v in quad_vertices], dtype=float_dtype)
-        except:
-            return np.array([np.nan, np.nan, np.nan,np.nan])
+        except QhullError: # too few points, or collinear
+            return np.full(4, np.nan, dtype=float_dtype)
+        return ComputeBehavior2.calc_hull_quadrant_overlap(coords[convexhull.vertices], float_dtype=float_dtype)
 
     @staticmethod
     def calc_centroid(coords, float_dtype='float32'):
+        from shapely.geometry import Polygon
         try: 
             return np.asarray(Polygon(coords).convex_hull.centroid.coords[0], dtype=float_dtype)
         except: 
@@ -1473,7 +2509,6 @@ class ComputeBehavior2:
                     demean_coords=False, float_dtype='float32'):
 
         # aliases
-        cumulative  = ComputeBehavior2.cumulative
         cum_mean    = ComputeBehavior2.calc_cumulative_mean
         compute_it  = ComputeBehavior2
 
@@ -1487,7 +2522,7 @@ class ComputeBehavior2:
 
         # summary variables
         coords_mean        = cum_mean(decisions_weighted, resp_mask, which='linear') # mean of coords - MAYBE SHOULD BE DECISIONS INSTED?
-        coords_centroid    = cumulative(compute_it.calc_centroid)(coordinates) # center of coords
+        coords_centroid    = np.array([hull.centroid for hull in compute_it.iter_cumulative_hulls(coordinates)]) # center of coords' hull
 
         coords = np.hstack([indices[:,np.newaxis], np.sum(resp_mask, axis=1)[:,np.newaxis], 
                             decisions_weighted, coordinates, coords_mean, coords_centroid])
@@ -1549,29 +2584,37 @@ class ComputeBehavior2:
         ''' probably better to compute over multiple character trials so can estimate a shape '''
 
         # aliases
-        cumulative = ComputeBehavior2.cumulative     
         compute_it = ComputeBehavior2
 
+        # sizes of the hull of the points so far: updated one point at a time
+        cumulative_size = lambda start=None: np.array([hull.size for hull in compute_it.iter_cumulative_hulls(coords, start)])
+
         # 2d
         if coords.shape[1] == 2:
-            size     = cumulative(compute_it.calc_shape_size)(coords)
-            size_pov = cumulative(compute_it.calc_shape_size)(np.vstack([np.array([6,0]), coords])) # include pov, then drop it to make length correct
-            overlap  = cumulative(compute_it.calc_quadrant_overlap)(coords)
-            shape_measures = rfn.unstructured_to_structured(np.hstack([size, size_pov[1:], overlap]), 
+            size, overlap = [], []
+            for hull in compute_it.iter_cumulative_hulls(coords):
+                size.append(hull.size)
+                overlap.append(compute_it.calc_hull_quadrant_overlap(hull.vertices))
+            size, overlap = np.array(size), np.array(overlap)
+            size_pov = cumulative_size(start=[[6, 0]]) # include pov
+            shape_measures = rfn.unstructured_to_structured(np.hstack([size, size_pov, overlap]), 
                                                             np.dtype([('perimeter', float_dtype),     ('area', float_dtype), 
                                                                       ('pov_perimeter', float_dtype), ('pov_area', float_dtype), 
                                                                       ('Q1_overlap', float_dtype),    ('Q2_overlap', float_dtype),
                                                                       ('Q3_overlap', float_dtype),    ('Q4_overlap', float_dtype)]))
         # 3d
         elif coords.shape[1] == 3:
-            size = cumulative(compute_it.calc_shape_size)(coords)
+            size = cumulative_size()
             shape_measures = rfn.unstructured_to_structured(size, np.dtype([('surface_area', float_dtype), ('volume', float_dtype)]))
             
         return shape_measures
  
 
-    def run(self, float_dtype='float32', labels='char_role_num'):
-        ''' labels controls how the trials are split up to calculate trajectories '''
+    def run(self, float_dtype='float32', labels='char_role_num', compact=False):
+        ''' 
+            labels controls how the trials are split up to calculate trajectories 
+            compact coerces the outputs to the data dictionary's dtypes (see info.coerce_dtypes)
+        '''
 
         # aliases
         unstructure = rfn.structured_to_unstructured
@@ -1637,12 +2680,13 @@ class ComputeBehavior2:
             df = pd.concat([task, out_df, shape_metrics], axis=1)
             df.reset_index(drop=True, inplace=True)
             del df['trial_index']
+            if compact: df = info.coerce_dtypes(df)
             if len(types) > 1: self.out[f'{dt}_{wt}_{ct}'] = df
             else:              self.out = df
 
 
 def compute_behavior(file_path, weight_types=False, decision_types=False, coord_types=False, 
-                     demean_coords=False, out_dir=None, overwrite=False):
+                     demean_coords=False, out_dir=None, fmt=None, overwrite=False, cache=True):
 
     # directories
     if out_dir is None: 
@@ -1657,15 +2701,25 @@ def compute_behavior(file_path, weight_types=False, decision_types=False, coord_
     
     # compute behavior & output
     sub_id = Path(file_path).stem.split('_')[1]
-    out_fname = Path(f'{out_dir}/SNT_{sub_id}_behavior.xlsx')
-    if not os.path.exists(out_fname) or overwrite:
+    if fmt is None: fmt = utils.default_table_format # the cache records the format actually written
+    out_fname = utils.table_fname(f'{out_dir}/SNT_{sub_id}_behavior', fmt)
+    params = {'weight_types': weight_types, 'decision_types': decision_types, 'coord_types': coord_types, 
+              'demean_coords': demean_coords, 'fmt': fmt}
+    if cache: 
+        # rerun if the input or parameters changed, not just if the output is missing
+        up_to_date = check_cache(out_dir, 'compute_behavior', file_path, params) is not None
+    else:
+        up_to_date = os.path.exists(out_fname)
+    if not up_to_date or overwrite:
         computer = ComputeBehavior2(file=file_path, weight_types=weight_types, decision_types=decision_types, 
                                                     coord_types=coord_types, demean_coords=demean_coords) # leave defaults for now:
         computer.run()
-        computer.out.to_excel(out_fname, index=False)
+        utils.write_table(computer.out, out_fname, fmt=fmt)
+        if cache: update_cache(out_dir, 'compute_behavior', file_path, params, [out_fname])
+    return out_fname
 
 
-def summarize_behavior(file_paths, out_dir=None):
+def summarize_behavior(file_paths, out_dir=None, fmt=None):
     '''
     '''
     # out directory
@@ -1706,7 +2760,9 @@ def summarize_behavior(file_paths, out_dir=None):
                         
             for col in by_character:
                 char_vals = [behav[behav['char_role_num'] == char][col].values[-1] for char in range(1,6)]
-                if 'angle' in col: mean_val = pycircstat.mean(char_vals)
+                if 'angle' in col: 
+                    import pycircstat
+                    mean_val = pycircstat.mean(char_vals)
                 else:              mean_val = np.mean(char_vals)
                 values.extend(char_vals)
                 values.extend([mean_val])
@@ -1728,7 +2784,7 @@ def summarize_behavior(file_paths, out_dir=None):
 
         summary_df = pd.concat(sub_dfs)
         summary_df.insert(0, 'sub_id', sub_ids)            
-        summary_df.to_excel(Path(f'{out_dir}/SNT-behavior_n{summary_df.shape[0]}.xlsx'), index=False)
+        utils.write_table(summary_df, f'{out_dir}/SNT-behavior_n{summary_df.shape[0]}', fmt=fmt)
 
 
 #------------------------------------------------------------------------------------------
@@ -1810,7 +2866,7 @@ def get_ctl_rdvs(metric='euclidean', trial_ixs=None):
     return pd.DataFrame(np.hstack([time_rdvs, narr_rdvs, dim_rdvs, char_rdvs]), columns=cols)
 
 
-def compute_rdvs(file_path, metric='euclidean', output_all=True, out_dir=None):
+def compute_rdvs(file_path, metric='euclidean', output_all=True, out_dir=None, fmt=None, cache=True):
 
     # out directory
     if out_dir is None: 
@@ -1827,10 +2883,14 @@ def compute_rdvs(file_path, metric='euclidean', output_all=True, out_dir=None):
     sub_id = file_path.stem.split('_')[1] # expects a filename like 'snt_subid_*'
     assert utils.is_numeric(sub_id), 'Subject id isnt numeric; check that filename has this pattern: "snt_subid*.xlsx"'
 
-    file_path = Path(file_path)
-    if file_path.suffix == '.xlsx':  behavior_ = pd.read_excel(file_path, engine='openpyxl')
-    elif file_path.suffix == '.xls': behavior_ = pd.read_excel(file_path)
-    elif file_path.suffix == '.csv': behavior_ = pd.read_csv(file_path)
+    if fmt is None: fmt = utils.default_table_format # the cache records the format actually written
+    params = {'metric': metric, 'output_all': output_all, 'fmt': fmt}
+    if cache:
+        cached = check_cache(out_dir, 'compute_rdvs', file_path, params)
+        if cached is not None: return cached
+
+    behavior_ = utils.read_table(file_path)
+    out_fnames = []
 
     # output all the decision type models?
     if output_all: 
@@ -1892,7 +2952,10 @@ def compute_rdvs(file_path, metric='euclidean', output_all=True, out_dir=None):
             rdvs.loc[:,'decision_direction'] = direction_rdv
 
             # output
-            rdvs.to_excel(Path(f'{out_dir}/snt_{sub_id}{outname}_rdvs.xlsx'), index=False)
+            out_fnames.append(utils.write_table(rdvs, f'{out_dir}/snt_{sub_id}{outname}_rdvs', fmt=fmt))
+
+    if cache: update_cache(out_dir, 'compute_rdvs', file_path, params, out_fnames)
+    return out_fnames
   
 
 #------------------------------------------------------------------------------------------
@@ -1930,8 +2993,6 @@ def fake_data():
 def load_data(file_path):
 
     file_path = Path(file_path)
-    if file_path.suffix == '.xlsx':  data = pd.read_excel(file_path, engine='openpyxl')
-    elif file_path.suffix == '.xls': data = pd.read_excel(file_path)
-    elif file_path.suffix == '.csv': data = pd.read_csv(file_path)
+    data = utils.read_table(file_path)
     sub_id = file_path.stem.split('_')[1]
     return [sub_id, data]
\ No newline at end of file
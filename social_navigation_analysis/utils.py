@@ -1,9 +1,8 @@
 import numpy as np
-import sklearn as sk
-from sklearn import metrics
 import itertools, functools
 import pandas as pd
 import re
+from pathlib import Path
 
 #--------------------------------------------------------------------------------------------
 # checking 
@@ -73,6 +72,31 @@ def substring_in_strings(substring, strings):
     return substring in '\t'.join(strings)
 
 
+def substitution_regex(literals, patterns=()):
+    '''
+        Compile several substitutions into one regex, to apply in a single pass (see substitute)
+
+        Arguments
+        ---------
+        literals : dict
+            {substring: replacement}
+        patterns : list of tuples (optional, default=())
+            [(regex pattern, replacement)]; the i-th pattern is captured in group 'p{i}'
+
+        Returns
+        -------
+        re.Pattern
+    '''
+    alternatives = [re.escape(k) for k in sorted(literals, key=len, reverse=True)] # longest first
+    alternatives.extend([f'(?P<p{i}>{pattern})' for i, (pattern, _) in enumerate(patterns)])
+    return re.compile('|'.join(alternatives))
+
+
+def substitute(regex, string, literals, patterns=()):
+    ''' apply the substitutions compiled by substitution_regex to a string '''
+    return regex.sub(lambda m: patterns[int(m.lastgroup[1:])][1] if m.lastgroup else literals[m.group(0)], string)
+
+
 #--------------------------------------------------------------------------------------------
 # neutral character
 #--------------------------------------------------------------------------------------------
@@ -190,13 +214,52 @@ def angle_between_vectors(u, v, direction=None, verbose=False):
     return rad
 
 
+def vector_angles(U, V, direction=None):
+    '''
+        Angles between the vectors in the last axis of U & V, broadcast against each other 
+        Same conventions as angle_between_vectors: 
+        - a vector at the origin is treated as orthogonal (π/2)
+        - the same vectors (or scalar multiples w/ the same signs) have no angle in between (0)
+
+        Arguments
+        ---------
+        U : array-like
+            shape (..., n_dims), eg (n_vectors, n_dims) or (n_vectors, 1, n_dims) for pairwise
+        V : array-like
+            shape (..., n_dims), eg (n_vectors, n_dims), (1, n_dims) for a reference or (1, n_vectors, n_dims) for pairwise
+        direction : optional (default=None)
+            None : included 180
+            False : counterclockwise 360 (2d only)
+            True : clockwise 360 (2d only)
+
+        Returns
+        -------
+        np.ndarray 
+            angles in radians, w/ the broadcast shape of U & V minus the last axis
+    '''
+    U, V = np.asarray(U), np.asarray(V)
+    dot        = np.einsum('...i,...i->...', U, V)
+    uu, vv     = np.einsum('...i,...i->...', U, U), np.einsum('...i,...i->...', V, V)
+    at_origin  = np.all(U == 0, axis=-1) | np.all(V == 0, axis=-1)
+    coincident = (dot * dot == uu * vv) & np.all(np.sign(U) == np.sign(V), axis=-1)
+    
+    with np.errstate(invalid='ignore', divide='ignore'): # the undefined angles are replaced below
+        if direction is None: # included: [0, π]
+            rad = np.arccos(dot / (np.sqrt(uu) * np.sqrt(vv)))
+        else: # difference of the vector angles from the origin, in [0, 2π]
+            u_rad, v_rad = np.arctan2(U[..., 1], U[..., 0]), np.arctan2(V[..., 1], V[..., 0])
+            if direction is True: rad = (v_rad - u_rad) % (2 * np.pi) # clockwise
+            else:                 rad = (u_rad - v_rad) % (2 * np.pi) # counterclockwise
+    return np.where(at_origin, np.pi/2, np.where(coincident, 0., rad))
+
+
 def calculate_angle(U, V=None, direction=None, force_pairwise=False, verbose=False):
     '''
         Calculate angles between n-dim vectors 
         If V == None, calculate U pairwise
         Else, calculate elementwise
         
-        TODO: more explanation; find more elegant ways to do this; also adapt other pairwise like functions to have structure
+        Computed w/ the broadcast vector_angles kernel; only pairwise outputs are wrapped in a DataFrame
 
         Arguments
         ---------
@@ -247,15 +310,15 @@ def calculate_angle(U, V=None, direction=None, force_pairwise=False, verbose=Fal
     elif U.shape == V.shape: 
         default = 'elementwise' 
 
-    # - 2 vectors, 1 w/ length==1 & is reference
+    # - 2 vectors, 1 w/ length==1 & is reference: broadcast, unless a pairwise output is wanted
     # -- pw, vector shape (1,u)
     elif (U.shape[0] > 1) & (V.shape[0] == 1): 
-        V = np.repeat(V, len(U), 0) 
+        if force_pairwise: V = np.repeat(V, len(U), 0) 
         default = 'reference'  
     
     # -- pw, vector shape (v,1)
     elif (U.shape[0] == 1) & (V.shape[0] > 1): 
-        U = np.repeat(U, len(V), 0) 
+        if force_pairwise: U = np.repeat(U, len(V), 0) 
         default = 'reference' 
         
     # - 2 vectors, different lengths
@@ -266,26 +329,47 @@ def calculate_angle(U, V=None, direction=None, force_pairwise=False, verbose=Fal
     messages.append(f'Calculated {default}')
     
     
-    # calculate angles
-    radians = np.zeros((U.shape[0], V.shape[0]))
-    for i in range(U.shape[0]):
-        for j in range(V.shape[0]):
-            radians[i, j] = angle_between_vectors(U[i,:], V[j,:], direction=direction)
+    if verbose: [print(m) for m in messages]
 
-            
-    # output
+    # elementwise & reference: 1 angle per vector 
+    if (not force_pairwise) & (default != 'pairwise'):
+        return vector_angles(U, V, direction=direction)
+
+    # pairwise: 1 angle per pair, as a labelled matrix
+    radians = vector_angles(U[:, np.newaxis, :], V[np.newaxis, :, :], direction=direction)
     if default == 'pairwise': cols = 'U'
     else:                     cols = 'V'
-    radians = pd.DataFrame(radians, index=[f'U{i+1:02d}' for i in range(len(U))], columns=[f'{cols}{i+1:02d}' for i in range(len(V))])
+    return pd.DataFrame(radians, index=[f'U{i+1:02d}' for i in range(len(U))], columns=[f'{cols}{i+1:02d}' for i in range(len(V))])
 
-    if not force_pairwise:
-        if default == 'reference':
-            radians = radians.iloc[:,0].values
-        elif default == 'elementwise':
-            radians = np.diag(radians)
-    if verbose: [print(m) for m in messages]
-        
-    return radians
+
+def cumulative_circular_stats(angles, axis=0):
+    '''
+        Circular mean, mean resultant length & circular variance of every prefix of angles (angles[:1], angles[:2], ...)
+        Keeps running sums of the cosines & sines (the resultant vector), so it is O(n) rather than a stat per prefix
+        Like pycircstat, a nan makes the stats nan from there on 
+
+        Arguments
+        ---------
+        angles : array-like
+            angles in radians
+        axis : int (optional, default=0)
+            axis to accumulate along
+
+        Returns
+        -------
+        mean : np.ndarray
+            circular mean, in [0, 2π)
+        length : np.ndarray
+            mean resultant length, in [0, 1]
+        variance : np.ndarray
+            circular variance: 1 - length
+    '''
+    angles = np.asarray(angles, dtype=float)
+    n = np.arange(1, angles.shape[axis] + 1).reshape([-1 if d == axis % angles.ndim else 1 for d in range(angles.ndim)])
+    cos_mean = np.cumsum(np.cos(angles), axis=axis) / n
+    sin_mean = np.cumsum(np.sin(angles), axis=axis) / n
+    length   = np.hypot(cos_mean, sin_mean)
+    return np.arctan2(sin_mean, cos_mean) % (2 * np.pi), length, 1 - length
 
 
 def cosine_distance(u, v=None):
@@ -293,7 +377,8 @@ def cosine_distance(u, v=None):
         cosine distance of (u, v) = 1 - (dot(u,v) / dot(l2_norm(u), l2_norm(v)))
         returns similarity measure [0,2]
     '''
-    return sk.metrics.pairwise_distances(u, v, metric='cosine')
+    from sklearn import metrics
+    return metrics.pairwise_distances(u, v, metric='cosine')
 
 
 def cosine_similarity(u, v=None):
@@ -303,7 +388,8 @@ def cosine_similarity(u, v=None):
         maybe issue: small angles tend to get very similar values(https://math.stackexchange.com/questions/2874940/cosine-similarity-vs-angular-distance)
 
     '''
-    return 1 - sk.metrics.pairwise_distances(u, v, metric='cosine')
+    from sklearn import metrics
+    return 1 - metrics.pairwise_distances(u, v, metric='cosine')
 
 
 def angular_distance(u, v=None):
@@ -322,6 +408,59 @@ def angular_similarity(u, v=None):
     return 1 - (np.arccos(cosine_similarity(u, v))/np.pi)
 
 
+def polygon_area(vertices):
+    ''' area of a simple polygon from its (ordered) vertices: the shoelace formula '''
+    n_vertices = len(vertices)
+    return abs(sum(vertices[v][0] * vertices[(v + 1) % n_vertices][1] - vertices[(v + 1) % n_vertices][0] * vertices[v][1] 
+                   for v in range(n_vertices))) / 2
+
+
+def polygon_centroid(vertices):
+    ''' centroid of a simple polygon from its (ordered) vertices: the area-weighted mean of the shoelace triangles' centroids '''
+    n_vertices = len(vertices)
+    area, x_moment, y_moment = 0, 0, 0
+    for v in range(n_vertices):
+        (x0, y0), (x1, y1) = vertices[v], vertices[(v + 1) % n_vertices]
+        cross     = x0 * y1 - x1 * y0
+        area     += cross
+        x_moment += (x0 + x1) * cross
+        y_moment += (y0 + y1) * cross
+    return x_moment / (3 * area), y_moment / (3 * area)
+
+
+def clip_polygon(vertices, dim, value, keep='above'):
+    '''
+        Part of a convex polygon on one side of an axis-aligned line (Sutherland-Hodgman, for 1 clipping edge)
+        Plain python: the polygons are small, so this beats numpy's per-call overhead
+
+        Arguments
+        ---------
+        vertices : list of tuples
+            ordered (x, y) vertices
+        dim : int 
+            0: clip at x = value; 1: clip at y = value
+        value : float
+        keep : str (optional, default='above')
+            'above' or 'below' the line
+
+        Returns
+        -------
+        list of tuples
+            ordered vertices of the clipped polygon (empty if it is all on the other side)
+    '''
+    inside = (lambda v: v[dim] >= value) if keep == 'above' else (lambda v: v[dim] <= value)
+    clipped = []
+    for v, vertex in enumerate(vertices):
+        next_vertex = vertices[(v + 1) % len(vertices)]
+        if inside(vertex): clipped.append(vertex)
+        if inside(vertex) != inside(next_vertex): # crosses the line: add the crossing
+            t = (value - vertex[dim]) / (next_vertex[dim] - vertex[dim])
+            crossing = [vertex[d] + t * (next_vertex[d] - vertex[d]) for d in range(2)]
+            crossing[dim] = value 
+            clipped.append(tuple(crossing))
+    return clipped
+
+
 #--------------------------------------------------------------------------------------------
 # list & array manipulation
 # TODO: simplify these into a smaller set of more robust functions
@@ -429,9 +568,10 @@ def make_symm_mat_mask(orig_ixs, size=(63)):
 
 
 def ut_vec_pw_dist(x, metric='euclidean'):
+    from sklearn import metrics # slow import: only when needed
     x = np.array(x)
     if x.ndim == 1:  x = x.reshape(-1,1)
-    return symm_mat_to_ut_vec(sk.metrics.pairwise_distances(x, metric=metric))
+    return symm_mat_to_ut_vec(metrics.pairwise_distances(x, metric=metric))
 
  
 def symm_mat_to_ut_vec(mat):
@@ -494,6 +634,116 @@ def remove_diag(arr):
     return arr[~np.isnan(arr)].reshape(arr.shape[0], arr.shape[1] - 1)
 
 
+#--------------------------------------------------------------------------------------------
+# reading & writing tables
+#--------------------------------------------------------------------------------------------
+
+
+# parquet is fast & keeps dtypes; xlsx & csv are for looking at in a spreadsheet
+table_formats = {'xlsx': '.xlsx', 'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'npz': '.npz'}
+default_table_format = 'parquet'
+
+
+def table_fname(file_path, fmt=None):
+    ''' swap the suffix of a file path for a table format's suffix '''
+    if fmt is None: fmt = default_table_format
+    if fmt not in table_formats:
+        raise Exception(f'Table format {fmt} not recognized: use one of {list(table_formats.keys())}')
+    return str(Path(file_path).with_suffix(table_formats[fmt]))
+
+
+def table_format(file_path):
+    ''' table format from a file suffix '''
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.xls': return 'xlsx'
+    for fmt, suffix_ in table_formats.items():
+        if suffix == suffix_: return fmt
+    raise Exception(f'File type {suffix} not recognized')
+
+
+def write_table(df, file_path, fmt=None, index=False):
+    '''
+        Write a dataframe in one of the table formats
+
+        Arguments
+        ---------
+        df : pd.DataFrame
+        file_path : str
+            output path; its suffix is replaced w/ the format's suffix
+        fmt : str (optional, default=None)
+            'xlsx', 'csv', 'parquet', 'feather' or 'npz'; None uses default_table_format
+        index : bool (optional, default=False)
+            whether to write the index too
+
+        Returns
+        -------
+        str
+            the path written to
+    '''
+    if fmt is None: fmt = default_table_format
+    file_path = table_fname(file_path, fmt)
+    if fmt == 'xlsx':
+        df.to_excel(file_path, index=index)
+    elif fmt == 'csv':
+        df.to_csv(file_path, index=index)
+    elif fmt == 'parquet':
+        df.to_parquet(file_path, index=index)
+    elif fmt == 'feather': # feather can't store an index
+        df.reset_index(drop=not index).to_feather(file_path)
+    elif fmt == 'npz':
+        # one array per column, so each keeps its own dtype; nothing is pickled
+        arrays = {'columns': np.array(df.columns.astype(str), dtype=str)}
+        for c, col in enumerate(df.columns):
+            if isinstance(df[col].dtype, pd.CategoricalDtype): # as codes & categories
+                arrays[f'col{c}_codes'] = df[col].cat.codes.values
+                arrays.update(_npz_arrays(f'col{c}_categories', df[col].cat.categories.values))
+            else:
+                arrays.update(_npz_arrays(f'col{c}', df[col].values))
+        if index:
+            arrays.update(_npz_arrays('index', df.index.values))
+        np.savez(file_path, **arrays)
+    return file_path
+
+
+def read_table(file_path):
+    ''' read a table written by write_table (or any xlsx, xls or csv), format detected from the file suffix '''
+    fmt = table_format(file_path)
+    if fmt == 'xlsx':
+        if Path(file_path).suffix.lower() == '.xlsx': return pd.read_excel(file_path, engine='openpyxl')
+        else:                                         return pd.read_excel(file_path)
+    elif fmt == 'csv':
+        return pd.read_csv(file_path)
+    elif fmt == 'parquet':
+        return pd.read_parquet(file_path)
+    elif fmt == 'feather':
+        return pd.read_feather(file_path)
+    elif fmt == 'npz':
+        with np.load(file_path, allow_pickle=False) as arrays:
+            columns = arrays['columns']
+            df = pd.DataFrame({col: (_npz_values(arrays, f'col{c}') if f'col{c}' in arrays else 
+                                     pd.Categorical.from_codes(arrays[f'col{c}_codes'], _npz_values(arrays, f'col{c}_categories')))
+                               for c, col in enumerate(columns)}, columns=columns)
+            if 'index' in arrays: df.index = _npz_values(arrays, 'index')
+        return df
+
+
+def _npz_arrays(name, values):
+    ''' arrays to save values in an npz without pickling: objects (eg strings) as fixed-width unicode & a mask of the missing values '''
+    values = np.asarray(values)
+    if values.dtype != object: return {name: values}
+    missing = pd.isnull(values)
+    return {name: np.where(missing, '', values).astype(str), f'{name}_missing': missing}
+
+
+def _npz_values(arrays, name):
+    ''' values saved by _npz_arrays '''
+    values = arrays[name]
+    if f'{name}_missing' in arrays:
+        values = values.astype(object)
+        values[arrays[f'{name}_missing']] = np.nan
+    return values
+
+
 #--------------------------------------------------------------------------------------------
 #--------------------------------------------------------------------------------------------
 
@@ -10,7 +10,9 @@ warnings.filterwarnings("ignore")
 # my modules
 curr_dir = str(Path(__file__).parent.absolute())
 sys.path.append(str(Path(f'{curr_dir}/../social_navigation_analysis')))
-from preprocess import ComputeBehavior2
+from preprocess import ComputeBehavior2, IncrementalHull
+from scipy.spatial import ConvexHull
+import utils
 from test_utils import *
 
 test_subject_fname = '/Users/matty_gee/Dropbox/Projects/social_navigation_analysis/data/example_files/snt_18001.xlsx'
@@ -121,6 +123,44 @@ class TestBehavior(unittest.TestCase):
         self.assertAlmostEqual(cum_mean[-1,0], cum_sum[-1,0] / cum_count[-1,0], self.almost_tol, 'Cumulative mean for affiliation is off')
         self.assertAlmostEqual(cum_mean[-1,1], cum_sum[-1,1] / cum_count[-1,1], self.almost_tol, 'Cumulative mean for power is off')
 
+    def test_cumulative_circular_mean(self):
+        import pycircstat
+
+        angles    = np.random.uniform(0, 2 * np.pi, size=(self.n_trials, 1))
+        resp_mask = np.ones(self.n_trials, dtype=bool)
+        resp_mask[[0, 4, 5]] = False
+
+        # the mean of all the angles so far, carried forward over non-responses
+        cum_mean = ComputeBehavior2.calc_cumulative_mean(angles, resp_mask, which='circular', float_dtype='float64')
+        self.assertEqual(cum_mean[0, 0], 0)
+        self.assertAlmostEqual(cum_mean[3, 0], pycircstat.mean(angles[:4]), self.almost_tol)
+        self.assertEqual(cum_mean[5, 0], cum_mean[3, 0])
+        self.assertAlmostEqual(cum_mean[-1, 0], pycircstat.mean(angles), self.almost_tol)
+
+        # the running resultant's length & variance
+        means, lengths, variances = utils.cumulative_circular_stats(angles[:, 0])
+        self.assertAlmostEqual(means[-1], pycircstat.mean(angles), self.almost_tol)
+        self.assertAlmostEqual(lengths[6], pycircstat.resultant_vector_length(angles[:7]), self.almost_tol)
+        self.assertAlmostEqual(variances[-1], pycircstat.var(angles), self.almost_tol)
+
+    def test_incremental_hull(self):
+        for n_dims in [2, 3]:
+            coords = np.cumsum(np.random.choice([-1, 0, 1], size=(40, n_dims)), axis=0).astype(float)
+            coords[:3] = [[0] * n_dims, [1] * n_dims, [2] * n_dims] # collinear: no hull yet
+            hulls  = [hull.size for hull in ComputeBehavior2.iter_cumulative_hulls(coords)]
+            self.assertTrue(np.isnan(hulls[2]).all())
+            for c in range(3, len(coords)):
+                try:    expected = [ConvexHull(coords[:c+1]).area, ConvexHull(coords[:c+1]).volume]
+                except: expected = [np.nan, np.nan]
+                np.testing.assert_allclose(hulls[c], expected, rtol=1e-12)
+        
+        # the vertices stay counterclockwise in 2D
+        hull = IncrementalHull(2)
+        for point in [[0, 0], [2, 0], [0, 2], [1, 1], [2, 2], [-1, 1]]: hull.add(point)
+        start = np.flatnonzero((hull.vertices == [2, 0]).all(axis=1))[0] # any vertex can come 1st
+        np.testing.assert_array_equal(np.roll(hull.vertices, -start, axis=0), [[2, 0], [2, 2], [0, 2], [-1, 1], [0, 0]])
+        np.testing.assert_allclose(hull.size, [4 + 2 * np.sqrt(2) + 2, 5])
+
     def test_quadrant_overlap_sum1_and_correct_quad(self):
 
         q1_coords = np.array([[4,4], [-1,4], [-1,-1], [4,-1]])
@@ -137,6 +177,20 @@ class TestBehavior(unittest.TestCase):
             max_quad = np.where(overlap == np.max(overlap))[0][0]
             self.assertAlmostEqual(max_quad, q, self.almost_tol, f'The quarant with the max value {max_quad}!={q}')
 
+    def test_quadrant_overlap_clipped(self):
+
+        # a hull that extends past the 6x6 quadrants: only the parts inside count
+        coords  = np.array([[-2,-2], [10,-2], [10,2], [-2,2]])
+        overlap = ComputeBehavior2.calc_quadrant_overlap(coords)
+        np.testing.assert_allclose(overlap, np.array([12, 4, 4, 12]) / 48, atol=1e-6)
+
+        # polygon helpers
+        square = [(0,0), (4,0), (4,4), (0,4)]
+        self.assertEqual(utils.polygon_area(square), 16)
+        self.assertEqual(utils.polygon_area(utils.clip_polygon(square, 0, 1, keep='above')), 12)
+        self.assertEqual(utils.polygon_area(utils.clip_polygon(square, 1, 1, keep='below')), 4)
+        self.assertEqual(utils.clip_polygon(square, 0, 5, keep='above'), [])
+
     def test_cumulative_centroid(self):
 
         # test the cumualtive centroid function, which incls. the cumulative wrapper
@@ -153,6 +207,21 @@ class TestBehavior(unittest.TestCase):
         for i in range(len(cum_centroids_)): 
             self.assertTrue(cum_centroids[i] == cum_centroids_[i] or (np.isnan(cum_centroids[i]) and np.isnan(cum_centroids_[i])))
 
+    def test_running_centroid(self):
+
+        # the incremental hull's centroid matches shapely's hull centroid; shapely can't make a polygon from < 3 points
+        coords = ComputeBehavior2.get_coords(fake_decisions_2d(n_trials=self.n_trials),
+                                             which='actual', demean=False)
+        run_centroids = np.array([hull.centroid for hull in ComputeBehavior2.iter_cumulative_hulls(coords)])
+        cum_centroids = ComputeBehavior2.cumulative(ComputeBehavior2.calc_centroid)(coords)
+        np.testing.assert_allclose(run_centroids[2:], cum_centroids[2:], atol=1e-5)
+
+        # degenerate hulls: a point & a segment (incl. repeated & collinear points)
+        centroids = [hull.centroid.tolist() for hull in ComputeBehavior2.iter_cumulative_hulls(np.array([[1,1], [1,1], [3,1], [2,1], [0,1], [0,3]]))]
+        self.assertListEqual(centroids[:5], [[1,1], [1,1], [2,1], [2,1], [1.5,1]])
+        np.testing.assert_allclose(centroids[5], [1, 5/3])
+        self.assertEqual(utils.polygon_centroid([(0,0), (4,0), (4,2), (0,2)]), (2, 1))
+
     # def test_centroids(self):
     #     # not sure what else to tes there
     #     decisions = fake_decisions_2d(n_trials=self.n_trials)
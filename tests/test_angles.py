@@ -66,5 +66,24 @@ class TestAngles(unittest.TestCase):
         res2 = utils.calculate_angle(V, U, force_pairwise=True)
         self.assertEqual(res1.T.values.all(), res2.T.values.all())
 
+    # the broadcast kernel matches the scalar function, incl. vectors at the origin & scalar multiples
+    def test_05_vector_angles_match_angle_between_vectors(self):
+        U = np.vstack([np.random.randint(-5, 5, size=(20, 2)), [[0, 0], [1, 1], [2, 0], [0, 3]]])
+        V = np.vstack([np.random.randint(-5, 5, size=(20, 2)), [[1, 2], [2, 2], [-1, 0], [0, 1]]])
+        for direction in [None, True, False]:
+            expected = [utils.angle_between_vectors(u, v, direction=direction) for u, v in zip(U, V)]
+            np.testing.assert_allclose(utils.vector_angles(U, V, direction=direction), expected, atol=1e-12)
+            np.testing.assert_allclose(utils.calculate_angle(U, V, direction=direction), expected, atol=1e-12)
+            expected = [[utils.angle_between_vectors(u, v, direction=direction) for v in V[:5]] for u in U]
+            np.testing.assert_allclose(utils.calculate_angle(U, V[:5], direction=direction).values, expected, atol=1e-12)
+        self.assertListEqual(utils.vector_angles(U[-4:], V[-4:]).tolist(), [np.pi/2, 0, np.pi, 0])
+
+    # a single vector against a set: one angle per vector in the set
+    def test_06_calculate_angle_reference(self):
+        U = np.random.randint(1, 10, size=(1, 2))
+        V = np.random.randint(-9, 10, size=(6, 2))
+        np.testing.assert_allclose(utils.calculate_angle(U, V, direction=True), 
+                                   [utils.angle_between_vectors(U[0], v, direction=True) for v in V], atol=1e-12)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
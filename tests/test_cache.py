@@ -0,0 +1,76 @@
+import unittest
+import sys, tempfile, shutil, os
+from pathlib import Path
+import numpy as np
+import warnings
+warnings.filterwarnings("ignore")
+
+# my modules
+curr_dir = str(Path(__file__).parent.absolute())
+sys.path.append(str(Path(f'{curr_dir}/../social_navigation_analysis')))
+import info, utils
+from preprocess import parse_log, compute_behavior, check_cache, list_cache, evict_cache
+
+
+class TestCache(unittest.TestCase):
+
+    def test_parse_log_reruns_on_changes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = f'{tmp_dir}/snt_90001.log'
+            shutil.copy(info.example_log_file, log_file)
+            params = {'experimenter': 'nr', 'output_timing': False, 'fmt': utils.default_table_format}
+
+            out_fname = parse_log(log_file, 'nr', output_timing=False, out_dir=tmp_dir)
+            self.assertListEqual(check_cache(tmp_dir, 'parse_log', log_file, params), [out_fname])
+            mtime = os.path.getmtime(out_fname)
+            self.assertEqual(parse_log(log_file, 'nr', output_timing=False, out_dir=tmp_dir), out_fname)
+            self.assertEqual(os.path.getmtime(out_fname), mtime, 'Unchanged log should not be reparsed')
+
+            # different parameters
+            self.assertIsNone(check_cache(tmp_dir, 'parse_log', log_file, {**params, 'fmt': 'csv'}))
+
+            # changed input
+            with open(log_file, 'a') as f:
+                f.write('\n')
+            self.assertIsNone(check_cache(tmp_dir, 'parse_log', log_file, params))
+            entries = list_cache(tmp_dir)
+            self.assertEqual(len(entries), 1)
+            self.assertTrue(entries['stale'][0])
+            self.assertEqual(entries['reason'][0], 'input changed')
+
+            parse_log(log_file, 'nr', output_timing=False, out_dir=tmp_dir)
+            self.assertFalse(list_cache(tmp_dir)['stale'][0])
+
+    def test_default_format_change_reruns(self):
+        # the cache records the format written, not fmt=None
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = f'{tmp_dir}/snt_90001.log'
+            shutil.copy(info.example_log_file, log_file)
+            default_table_format = utils.default_table_format
+            try:
+                utils.default_table_format = 'xlsx'
+                self.assertTrue(parse_log(log_file, 'nr', output_timing=False, out_dir=tmp_dir).endswith('.xlsx'))
+                utils.default_table_format = 'csv'
+                self.assertTrue(parse_log(log_file, 'nr', output_timing=False, out_dir=tmp_dir).endswith('.csv'))
+            finally:
+                utils.default_table_format = default_table_format
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_files = [f'{tmp_dir}/snt_9000{s}.log' for s in [1, 2]]
+            for log_file in log_files:
+                shutil.copy(info.example_log_file, log_file)
+                out_fname = parse_log(log_file, 'nr', output_timing=False, out_dir=f'{tmp_dir}/out')
+                compute_behavior(out_fname, out_dir=f'{tmp_dir}/out')
+            self.assertListEqual(sorted(list_cache(tmp_dir)['step'].unique()), ['compute_behavior', 'parse_log'])
+
+            os.remove(log_files[0])
+            self.assertEqual(len(evict_cache(tmp_dir, stale_only=False, steps=['compute_behavior'])), 2)
+            evicted = evict_cache(tmp_dir)
+            self.assertEqual(len(evicted), 1)
+            self.assertEqual(evicted['reason'][0], 'input missing')
+            self.assertEqual(len(list_cache(tmp_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import sys, subprocess
+from pathlib import Path
+
+curr_dir = str(Path(__file__).parent.absolute())
+pkg_parent = str(Path(f'{curr_dir}/..'))
+
+
+def imported_modules(statement):
+    ''' top-level modules loaded by a statement, in a fresh interpreter '''
+    code = f"import sys; {statement}; print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    out = subprocess.run([sys.executable, '-c', code], cwd=pkg_parent, capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+class TestImports(unittest.TestCase):
+
+    heavy = ['matplotlib', 'sklearn', 'PIL', 'alphashape', 'shapely', 'pycircstat', 'patsy']
+
+    def test_package_import_is_lazy(self):
+        modules = imported_modules('import social_navigation_analysis')
+        for module in ['pandas'] + self.heavy:
+            self.assertNotIn(module, modules)
+
+    def test_preprocess_defers_heavy_stacks(self):
+        modules = imported_modules('from social_navigation_analysis import preprocess; preprocess.ComputeBehavior2')
+        for module in self.heavy:
+            self.assertNotIn(module, modules, f'{module} should only be imported when first used')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys, tempfile, os, importlib.util
+from pathlib import Path
+import pandas as pd
+import warnings
+warnings.filterwarnings("ignore")
+
+# my modules
+curr_dir = str(Path(__file__).parent.absolute())
+sys.path.append(str(Path(f'{curr_dir}/../social_navigation_analysis')))
+import info
+
+
+class TestInfo(unittest.TestCase):
+
+    def test_lazy_tables(self):
+        # a fresh copy of the module, since other tests may have loaded the tables already
+        spec  = importlib.util.spec_from_file_location('info_', info.__file__)
+        info_ = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(info_)
+        self.assertNotIn('task', vars(info_), 'Tables should not be read on import')
+        self.assertEqual(info_.decision_trials.shape[0], 63)
+        self.assertIn('task', vars(info_))
+        self.assertListEqual(list(info_.validated_decisions.keys()), ['standard', 'schema', 'adolescent'])
+        self.assertTrue(info_.task['cogent_onset'].is_monotonic_increasing)
+        with self.assertRaises(AttributeError):
+            info_.not_a_table
+
+    def test_cache_rebuilds_on_change(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            xlsx_fname = f'{tmp_dir}/table.xlsx'
+            pd.DataFrame({'decision_num': [1, 2]}).to_excel(xlsx_fname, index=False)
+            self.assertListEqual(info.read_xlsx_cached(xlsx_fname)['decision_num'].tolist(), [1, 2])
+            self.assertTrue(Path(f'{tmp_dir}/table.parquet').exists())
+
+            # touched but unchanged: still reads the copy
+            os.utime(xlsx_fname, (0, 0))
+            self.assertListEqual(info.read_xlsx_cached(xlsx_fname)['decision_num'].tolist(), [1, 2])
+
+            pd.DataFrame({'decision_num': [3, 4, 5]}).to_excel(xlsx_fname, index=False)
+            self.assertListEqual(info.read_xlsx_cached(xlsx_fname)['decision_num'].tolist(), [3, 4, 5])
+            self.assertEqual(pd.read_parquet(f'{tmp_dir}/table.parquet').shape[0], 3)
+
+            # written via temp files, moved into place
+            self.assertListEqual(sorted(os.listdir(tmp_dir)), ['table.parquet', 'table.parquet.json', 'table.xlsx'])
+
+    def test_replace_file_keeps_the_old_file_on_failure(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = f'{tmp_dir}/meta.json'
+            info._replace_file(file_path, lambda path: info._write_json({'a': 1}, path))
+            def fail(path):
+                Path(path).write_text('{"a": ')
+                raise OSError('disk full')
+            with self.assertRaises(OSError):
+                info._replace_file(file_path, fail)
+            self.assertEqual(Path(file_path).read_text(), '{"a": 1}')
+            self.assertListEqual(os.listdir(tmp_dir), ['meta.json'])
+
+    def test_coerce_dtypes(self):
+        df = pd.DataFrame({'decision_num': [1, 2, 3], 'dimension': ['affil', 'power', 'affil'], 
+                           'reaction_time': [1.5, 2.0, 0.5], 'first_likability': [50, None, 100],
+                           'sni_number_ppl': ['12', '300', '4'], 'memory_01_first': ['first', 'boss', 'first']})
+        compact = info.coerce_dtypes(df)
+        self.assertListEqual([str(d) for d in compact.dtypes], ['int8', 'category', 'float32', 'float32', 'int16', 'category'])
+        self.assertListEqual(compact['sni_number_ppl'].tolist(), [12, 300, 4])
+        self.assertEqual(df['decision_num'].dtype, 'int64') # a copy
+        self.assertEqual(len(info.validate_table(df)), 0)
+
+    def test_validate_table(self):
+        df = pd.DataFrame({'decision_num': [1, 200], 'button_press': [1, 1.5], 'reaction_time': ['fast', 1.0], 'not_a_column': [0, 0]})
+        problems = info.validate_table(df).set_index('column')['problem']
+        self.assertDictEqual(problems.to_dict(), {'decision_num': 'has values outside the int8 range', 
+                                                  'button_press': 'has non-whole numbers', 
+                                                  'reaction_time': 'has non-numeric values', 
+                                                  'not_a_column': 'not in the data dictionary'})
+        with self.assertRaises(Exception):
+            info.validate_table(df, raise_errors=True)
+        # what can't be coerced is left as it is
+        self.assertListEqual([str(d) for d in info.coerce_dtypes(df).dtypes], ['float32', 'float32', 'object', 'int64'])
+
+
+if __name__ == '__main__':
+    unittest.main()
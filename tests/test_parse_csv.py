@@ -0,0 +1,287 @@
+import unittest
+import sys, glob, tempfile, json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import warnings
+warnings.filterwarnings("ignore")
+
+# my modules
+curr_dir = str(Path(__file__).parent.absolute())
+sys.path.append(str(Path(f'{curr_dir}/../social_navigation_analysis')))
+import info, utils
+import preprocess
+from preprocess import ParseCsv, ParseCohortCsv, column_plan, column_buckets
+
+csv_dir = str(Path(f'{info.data_dir}/example_files/example_csvs'))
+snt_versions = {'Adolescent_pilot01.csv': 'adolescent_pilot',
+                'Schema-Day01.csv': 'schema',
+                'Schema-Day01_older-format.csv': 'schema'}
+
+
+def example_parsers():
+    for csv_path in sorted(glob.glob(f'{csv_dir}/*.csv')):
+        yield ParseCsv(csv_path, snt_version=snt_versions.get(Path(csv_path).name, 'standard'))
+
+
+def vtech_txt(txt_file, prolific_id, version):
+    ''' write a made up VTech txt '''
+    rng   = np.random.default_rng(0)
+    names = ['Maya', 'Chris', 'Anthony', 'Newcomb', 'Hayworth', 'Kayce']
+    join  = lambda values: '[' + ','.join(map(str, values)) + ']'
+    exp_data = {'prolific_pid': prolific_id, 'version': version,
+                'narrative_resps': join(rng.integers(1, 3, 63)),
+                'narrative_opts_order': '[' + ','.join(f'["option {a} {i}","option {b} {i}"]' for i, (a, b) 
+                                                       in enumerate(rng.choice(list('abcd'), (63, 2)))) + ']',
+                'narrative_rts': join(rng.integers(500, 9000, 250)),
+                'character_imgs': {n: f'Older{"Female" if i % 2 else "Male"}Br_{i}' for i, n in enumerate(names)},
+                'memory_quests_order': join([f'"question {q:02d}"' for q in rng.permutation(30)]),
+                'memory_resps': join([f'"{n}"' for n in rng.choice(names, 30)]),
+                'memory_rts': join(rng.integers(500, 5000, 30)),
+                'dots_resps': ','.join(f'["{n}:0","affil:{a}","power:{p}"]' for n, a, p in zip(names, *rng.integers(0, 1000, (2, 6)))),
+                'perception_character_order': list(rng.permutation(names)),
+                'emotion_resps': '[' + ','.join(f'["happy",{a},"sad",{b}]' for a, b in rng.integers(0, 100, (6, 2))) + ']',
+                'iq_quests': '["vr4","mx47","ln7"]', 'iq_resps': '["5","b","y"]',
+                'end_questions': '"engagement":["5"];"difficulty":["3"];"relatability":["4"]'}
+    for col in ['liking', 'competence', 'similarity']:
+        exp_data[f'{col}_resps'], exp_data[f'{col}_rts'] = join(rng.integers(0, 100, 6)), join(rng.integers(500, 5000, 6))
+    with open(txt_file, 'w') as f:
+        json.dump({'metadata': {'social_task_data': exp_data}}, f)
+
+
+class TestParseCsv(unittest.TestCase):
+
+    def test_process_snt(self):
+        for parser in example_parsers():
+            snt = parser.process_snt()
+            self.assertEqual(snt.shape[0], 63)
+            self.assertListEqual(snt['decision_num'].tolist(), list(range(1, 64)))
+            self.assertTrue(np.all(snt['decision'] == snt['affil'] + snt['power']))
+            self.assertTrue(np.all(snt['power'][snt['dimension'] == 'affil'] == 0))
+            self.assertTrue(np.all(np.isin(snt['button_press'], [1, 2])))
+            for col in ['button_press', 'decision', 'affil', 'power']:
+                self.assertEqual(snt[col].dtype, int)
+
+            # the choice is the pressed option after sorting the options alphabetically
+            validated = info.validated_decisions[parser.snt_ver]
+            bps  = [int(utils.remove_nonnumeric(d.split(':')[1])) for d in parser.data['snt_choices'].values[0].split(',')]
+            opts = parser.data['snt_opts_order'].values[0].split('","')
+            for q in [0, 17, 62]:
+                options = [utils.remove_nontext(opts[q].split(';')[o]) for o in [1, 2]]
+                choice  = np.argsort(options)[bps[q] - 1] + 1
+                self.assertEqual(snt.loc[q, 'affil'], validated.loc[q, f'option{choice}_affil'])
+                self.assertEqual(snt.loc[q, 'power'], validated.loc[q, f'option{choice}_power'])
+
+    def test_clean(self):
+        raw = pd.DataFrame({'prolific_id': ['Sub1'] * 2, 'task_ver': ['OFA'] * 2,
+                            'Memory.Resp': ['Newcomb', 'Newcomb'], 'Free_Response.text': ['Maya & HAYWORTH'] * 2,
+                            'snt.judgments.newcomb.likability.resp': [55, 55], 'Narrative.RTs': ['[1,2]'] * 2,
+                            'demographics.Maya.feminine.rt': [1.5, 1.5], 'Relationship.Feelings': [True, True]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            raw.to_csv(f'{tmp_dir}/snt.csv', index=False)
+            data = ParseCsv(f'{tmp_dir}/snt.csv').data
+
+        self.assertEqual(data.shape[0], 1)
+        self.assertListEqual(data.columns.tolist(), ['prolific_id', 'task_ver', 'memory_resp', 'free_response_text',
+                                                     'judgments_powerful_likability_resp', 'snt_rts',
+                                                     'judgments_first_feminine_rt', 'character_relationship'])
+        self.assertListEqual(data.iloc[0, :4].tolist(), ['sub1', 'ofa', 'powerful', 'first & boss'])
+        self.assertEqual(data['judgments_powerful_likability_resp'].dtype, int, 'Numeric columns should stay numeric')
+        self.assertEqual(data['judgments_first_feminine_rt'].values[0], 1.5)
+        self.assertEqual(data['character_relationship'].values[0], 'true')
+
+    def test_column_plan(self):
+        for parser in example_parsers():
+            for bucket, in_bucket in column_buckets.items():
+                self.assertListEqual(parser.columns(bucket), [c for c in parser.data.columns if in_bucket(c)])
+
+        # files from the same export reuse the plan
+        csv_path = f'{csv_dir}/Prolific-replication.csv'
+        ParseCsv(csv_path)
+        hits = column_plan.cache_info().hits
+        parser = ParseCsv(csv_path)
+        self.assertEqual(column_plan.cache_info().hits, hits + 1)
+        self.assertIs(parser.plan, ParseCsv(csv_path).plan)
+
+    def test_cohort(self):
+        # participants from 2 exports w/ different formats, 2 task versions & a repeated row
+        rows = {'Prolific-replication.csv': {'sub1': 'YMA', 'sub2': 'YFB', 'sub3': 'YMA'},
+                'Prolific-initial_older-format.csv': {'sub4': 'YMB', 'sub5': 'YMB'}}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_paths, single = [], {}
+            for fname, subs in rows.items():
+                row = pd.read_csv(f'{csv_dir}/{fname}').iloc[[0]]
+                choices_col = [c for c in row.columns if c.endswith('choices')][0]
+                export = []
+                for s, (sub_id, task_ver) in enumerate(subs.items()):
+                    sub = row.assign(prolific_id=sub_id, task_ver=task_ver)
+                    if s > 0: # reverse the button presses, so participants differ
+                        sub[choices_col] = sub[choices_col].str.replace(':1', ':x').str.replace(':2', ':1').str.replace(':x', ':2')
+                    sub.to_csv(f'{tmp_dir}/snt_{sub_id}_x_2022-01-01.csv', index=False)
+                    export.append(sub)
+                    single[sub_id] = ParseCsv(f'{tmp_dir}/snt_{sub_id}_x_2022-01-01.csv').run()
+                csv_paths.append(f'{tmp_dir}/snt_{Path(fname).stem}_x_2022-01-01.csv')
+                pd.concat(export + export[:1]).to_csv(csv_paths[-1], index=False)
+            snt, post = ParseCohortCsv(csv_paths).run(compact=False)
+            snt_compact, post_compact = ParseCohortCsv(csv_paths).run()
+
+        sub_ids = ['sub1', 'sub2', 'sub3', 'sub4', 'sub5']
+        self.assertListEqual(post.index.tolist(), sub_ids)
+        self.assertEqual(post.index.name, 'prolific_id')
+        self.assertListEqual(snt['prolific_id'].unique().tolist(), sub_ids)
+        for sub_id in sub_ids:
+            snt_, post_ = single[sub_id]
+            pd.testing.assert_frame_equal(snt[snt['prolific_id'] == sub_id].drop(columns='prolific_id').reset_index(drop=True), snt_)
+            post_ = post_.drop(columns='date')
+            post_ = post_.loc[:, ~post_.columns.duplicated()] # repeats are numbered in the cohort
+            pd.testing.assert_frame_equal(post.loc[[sub_id], post_.columns], post_, check_dtype=False, check_names=False)
+        self.assertFalse(np.all(snt.loc[snt['prolific_id'] == 'sub1', 'decision'].values == 
+                                snt.loc[snt['prolific_id'] == 'sub2', 'decision'].values))
+
+        # compact dtypes span the cohort
+        self.assertListEqual(post_compact['task_ver'].cat.categories.tolist(), ['yfb', 'yma', 'ymb'])
+        self.assertEqual(snt_compact['decision'].dtype, np.int8)
+        self.assertLess(snt_compact.memory_usage(deep=True).sum(), snt.memory_usage(deep=True).sum() / 4)
+        pd.testing.assert_frame_equal(snt_compact, info.coerce_dtypes(snt))
+
+    def test_cohort_iq_blank_response(self):
+        # a participant's blank numeric iq answer makes the column float: the others' answers still count
+        row = pd.read_csv(f'{csv_dir}/Prolific-replication.csv').iloc[[0]]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = f'{tmp_dir}/snt_cohort_x_2022-01-01.csv'
+            rows = pd.concat([row.assign(prolific_id=f'sub{s}') for s in range(3)], ignore_index=True)
+            rows.loc[1, 'iq.VR4.resp'] = np.nan
+            rows.to_csv(csv_path, index=False)
+            _, post = ParseCohortCsv([csv_path]).run(compact=False)
+        single = ParseCsv(f'{csv_dir}/Prolific-replication.csv').process_iq()['iq_score'].values[0]
+        self.assertListEqual(post['iq_score'].tolist(), [single, single - 1 / len(preprocess.iq_answers), single])
+
+    def test_scorers(self):
+        # 3 participants from one row: as is, all correct, & all at the 'left' end of the forced choice scale
+        row     = pd.read_csv(f'{csv_dir}/Prolific-replication.csv').iloc[[0]]
+        rows    = pd.concat([row.assign(prolific_id=f'sub{s}') for s in range(3)], ignore_index=True)
+        parser  = ParseCsv(f'{csv_dir}/Prolific-replication.csv', data=rows, cohort=True)
+        columns = parser.data.columns
+        
+        ques = parser.data.iloc[1][parser.columns('memory_question')].values
+        key  = np.array(info.character_roles)[preprocess.memory_answer_keys['standard']]
+        parser.data.loc[1, parser.columns('memory_resp')] = key[np.argsort(np.argsort(ques))]
+        iq_cols = parser.columns('iq_resp')
+        parser.data.loc[1, iq_cols] = [preprocess.iq_answers[c.split('_')[1]] for c in iq_cols]
+        parser.data.loc[2, [c for c in columns if c.startswith('forced_choice') & c.endswith('resp')]] = 0
+        
+        memory, forced_choice, iq = parser.process_memory(), parser.process_forced_choice(), parser.process_iq()
+        self.assertTrue(np.all(memory.loc['sub1', [f'memory_{r}' for r in info.character_roles] + ['memory_mean']] == 1))
+        self.assertEqual(iq.loc['sub1', 'iq_score'], len(iq_cols) / len(preprocess.iq_answers))
+        
+        # forced choice: columns are alphabetically sorted pairs, w/ the chosen option's distance from the center
+        choice_cols = [c for c in forced_choice.columns if not c.endswith('reaction_time')]
+        self.assertTrue(np.all(np.abs(forced_choice.loc['sub2', choice_cols]) == 50))
+        self.assertTrue(np.all(forced_choice[choice_cols[0::2]].values == -forced_choice[choice_cols[1::2]].values))
+        
+        # the same as one participant at a time
+        for r, sub_id in enumerate(parser.sub_ids):
+            row_parser = parser.row_parser(r)
+            for task, out in zip(['memory', 'forced_choice', 'iq'], [memory, forced_choice, iq]):
+                pd.testing.assert_frame_equal(out.loc[[sub_id]], getattr(row_parser, f'process_{task}')())
+
+    def test_realworld(self):
+        row    = pd.read_csv(f'{csv_dir}/Prolific-replication.csv').iloc[[0]]
+        rows   = pd.concat([row.assign(prolific_id=f'sub{s}') for s in range(3)], ignore_index=True)
+        parser = ParseCsv(f'{csv_dir}/Prolific-replication.csv', data=rows, cohort=True)
+        
+        # sub1: 3 for dating (2 people), no number of parents; sub2: a relative w/ a missing rating
+        parser.data.loc[1, 'realworld_relationships_dating_number_of_people_value'] = 3
+        parser.data.loc[1, 'realworld_relationships_parents_number_of_people_value'] = np.nan
+        parser.data.loc[2, 'realworld_relationships_relatives_people_0_likability'] = np.nan
+        realworld = parser.process_realworld()
+        
+        self.assertEqual(parser.data.loc[0, 'realworld_relationships_dating_number_of_people_value'], 1)
+        n_parents = parser.data.loc[0, 'realworld_relationships_parents_number_of_people_value']
+        self.assertEqual(realworld.loc['sub1', 'sni_number_ppl'], realworld.loc['sub0', 'sni_number_ppl'] + 1 - n_parents)
+        self.assertEqual(realworld.loc['sub1', 'sni_network_diversity'], realworld.loc['sub0', 'sni_network_diversity'] - 1)
+        self.assertTrue(realworld.loc['sub1', [c for c in realworld.columns if c.startswith('parents')]].isnull().all())
+        self.assertTrue(realworld.loc['sub2', [c for c in realworld.columns if c.startswith('relatives')]].isnull().all())
+        self.assertFalse(realworld.loc['sub0'].isnull().any())
+        self.assertEqual(realworld.loc['sub0', 'dating_01_dots_affil'], 
+                         (parser.data.loc[0, 'realworld_relationships_dating_people_0_dots_affil'] - 500) / 500)
+        pd.testing.assert_frame_equal(realworld.loc[['sub0']], parser.row_parser(0).process_realworld(), check_dtype=False)
+
+    def test_trust_game(self):
+        row  = pd.read_csv(f'{csv_dir}/Prolific-replication.csv').iloc[[0]]
+        rows = pd.concat([row.assign(prolific_id=f'sub{s}') for s in range(2)], ignore_index=True)
+        partners = [['Maya', 'computer', 'Chris', 'Maya'], ['Chris', 'Maya', 'Maya', 'computer']]
+        trust = {'trust_partner': ['Maya', 'Maya'], 'trust_game_bonus_amount': [1.5, 2.0]}
+        for t, trial_partners in enumerate(zip(*partners)):
+            r, t = t // 2 + 1, t % 2 + 1 # 2 rounds of 2 trials
+            trust[f'trust_game_round{r:02d}_trial{t:02d}_partner'] = list(trial_partners)
+            trust[f'trust_game_round{r:02d}_trial{t:02d}_choice']  = [r * t, r + t]
+            trust[f'trust_game_round{r:02d}_trial{t:02d}_rt']      = [0.5, 0.75]
+            trust[f'trust_game_round{r:02d}_trial{t:02d}_outcome'] = [2 * r * t, 2 * (r + t)]
+        trust['share_estimate_first_resp'] = [3, 4]
+        parser = ParseCsv(f'{csv_dir}/Prolific-replication.csv', data=pd.concat([rows, pd.DataFrame(trust)], axis=1), cohort=True)
+        parser.clean()
+        trust = parser.process_trust_game()
+        
+        # partners numbered in order across rounds
+        self.assertListEqual([c for c in trust.columns if c.endswith('_choice')], 
+                             ['trust_round01_other01_choice', 'trust_round01_computer01_choice', 'trust_round02_first01_choice', 
+                              'trust_round02_other02_choice', 'trust_round01_first01_choice', 'trust_round02_computer01_choice'])
+        self.assertEqual(trust.loc['sub0', 'trust_round02_other02_outcome'], 8)
+        self.assertEqual(trust.loc['sub1', 'trust_round02_other02_outcome'], 6)
+        self.assertEqual(trust.loc['sub1', 'trust_round01_other01_choice'], 3)
+        self.assertTrue(np.isnan(trust.loc['sub0', 'trust_round01_first01_choice']))
+        self.assertEqual(trust.columns[0], 'trust_game_bonus_amount')
+        self.assertListEqual(trust['share_estimate_first'].tolist(), [3, 4])
+        self.assertTrue(trust['share_estimate_rt_computer'].isnull().all())
+        for s in range(2):
+            sub_trust = parser.row_parser(s).process_trust_game()
+            pd.testing.assert_frame_equal(trust.loc[sub_trust.index, sub_trust.columns], sub_trust, check_dtype=False)
+
+    def test_parse_csvs(self):
+        fnames = ['Prolific-initial_older-format.csv', 'Prolific-replication.csv']
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_paths = []
+            for f, fname in enumerate(fnames):
+                csv_paths.append(f'{tmp_dir}/snt_{Path(fname).stem}_x_2022-01-0{f + 1}.csv')
+                pd.read_csv(f'{csv_dir}/{fname}').to_csv(csv_paths[-1], index=False)
+            pd.read_csv(csv_paths[1]).to_csv(f'{tmp_dir}/snt_repeated_x_2022-01-03.csv', index=False)
+            pd.DataFrame({'task_ver': ['YMA']}).to_csv(f'{tmp_dir}/snt_broken_x_2022-01-04.csv', index=False)
+
+            snt, post, manifest = preprocess.parse_csvs(tmp_dir, out_dir=f'{tmp_dir}/out', n_jobs=1, compact=False)
+            self.assertEqual(utils.read_table(f'{tmp_dir}/out/SNT-posttask.{utils.default_table_format}').shape, post.shape)
+            self.assertEqual(utils.read_table(f'{tmp_dir}/out/SNT_trials.{utils.default_table_format}').shape, snt.shape)
+
+            # failures are recorded, not raised
+            errors = manifest.set_index(manifest['file_path'].map(lambda f: Path(f).name))['error']
+            self.assertIn('prolific_id', errors['snt_broken_x_2022-01-04.csv'])
+            self.assertIn('already parsed', errors['snt_repeated_x_2022-01-03.csv'])
+            self.assertEqual(errors.notnull().sum(), 2)
+
+            for csv_path in csv_paths:
+                snt_, post_ = ParseCsv(csv_path).run()
+                sub_id = post_.index[0]
+                pd.testing.assert_frame_equal(snt[snt['sub_id'] == sub_id].drop(columns='sub_id').reset_index(drop=True), snt_)
+                self.assertEqual(post.loc[sub_id, 'date'], post_['date'].values[0])
+        self.assertListEqual(manifest['n_trials'].tolist(), [0, 63, 63, 0])
+
+    def test_vtech_txt(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for prolific_id, version in [('sub1', 'OFA'), ('sub2', 'YMB')]:
+                vtech_txt(f'{tmp_dir}/SNT.{prolific_id}.20220315T101010.txt', prolific_id, version)
+
+            # in memory, the record is the csv as it would be read back
+            parsers = list(preprocess.iter_vtech_txts(tmp_dir, csv_dir=tmp_dir))
+            self.assertListEqual([p.sub_id for p in parsers], ['sub1', 'sub2'])
+            for parser in parsers:
+                csv_fname = f'{tmp_dir}/SNT_{parser.sub_id}.csv'
+                txt_file  = parser.csv
+                pd.testing.assert_frame_equal(preprocess.read_vtech_txt(txt_file), pd.read_csv(csv_fname))
+                for from_txt, from_csv in zip(parser.run(), ParseCsv(csv_fname).run()):
+                    pd.testing.assert_frame_equal(from_txt, from_csv)
+            self.assertEqual(parser.post['date'].values[0], '2022/03/15')
+            self.assertEqual(parser.post['iq_score'].values[0], 2/16)
+
+
+if __name__ == '__main__':
+    unittest.main()
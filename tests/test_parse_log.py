@@ -0,0 +1,150 @@
+import unittest
+import sys, tempfile, shutil
+from pathlib import Path
+import numpy as np
+import warnings
+warnings.filterwarnings("ignore")
+
+# my modules
+curr_dir = str(Path(__file__).parent.absolute())
+sys.path.append(str(Path(f'{curr_dir}/../social_navigation_analysis')))
+import info
+from preprocess import get_log_keys, load_log_events, parse_log_choices, parse_log_timing, parse_logs, LOG_KEY, LOG_SLIDE
+from preprocess import log_to_bids_events, logs_to_bids_events, iter_log_runs
+
+
+def fake_log_events(presses):
+    '''
+        a minimal log: pic_1 then every decision slide (12s apart),
+        presses = {decision index: [(key, ms after slide start), ...]}
+    '''
+    rows = ['Cog2000 log file', '0\t[0]\t:\tpic_1_start: 1000', '0\t[0]\t:\tpic_1_end: 7000']
+    for t, slide in enumerate(info.decision_trials['cogent_slide_num']):
+        start = 10000 + t * 12000
+        rows.append(f'0\t[0]\t:\t{slide}_start: {start}')
+        for key, rt in presses.get(t, []):
+            rows.append(f'0\t[0]\t:\tKey\t{key}\tDOWN\tat\t{start + rt}   ')
+            rows.append(f'0\t[0]\t:\tKey\t{key}\tUP\tat\t{start + rt + 50}   ')
+        rows.append(f'0\t[0]\t:\t{slide}_end: {start + 11990}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = f'{tmp_dir}/snt_test.log'
+        with open(log_file, 'w') as f:
+            f.write('\n'.join(rows))
+        return load_log_events(log_file)
+
+
+class TestParseLog(unittest.TestCase):
+
+    keys = ['29', '30']
+
+    def test_load_log_events(self):
+        events = load_log_events(info.example_log_file)
+        self.assertEqual(len(events), 3604, 'Number of log rows w/ 4 or 8 items is off')
+        self.assertEqual(np.sum(events['kind'] == LOG_SLIDE), 460 - 2) # minus cogent start & stop rows
+        self.assertEqual(np.sum((events['kind'] == LOG_KEY) & events['is_start']), 1573)
+        first = events[(events['slide'] == 'pic_1') & events['is_start']][0]
+        self.assertEqual(first['time'], 74866)
+
+    def test_log_windows_keys_and_runs(self):
+        events = load_log_events(info.example_log_file)
+        self.assertTrue(np.all(load_log_events(info.example_log_file, window=100) == events), 'Windowed scan should match')
+
+        buttons = load_log_events(info.example_log_file, keys=self.keys)
+        self.assertTrue(np.all(np.isin(buttons['key'][buttons['kind'] == LOG_KEY], [29, 30])))
+        self.assertEqual(np.sum(buttons['kind'] == LOG_SLIDE), np.sum(events['kind'] == LOG_SLIDE))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(info.example_log_file, 'rb') as f:
+                log = f.read()
+            with open(f'{tmp_dir}/snt_90001.log', 'wb') as f:
+                f.write(log * 3)
+            runs = list(iter_log_runs(f'{tmp_dir}/snt_90001.log', window=10000))
+            self.assertEqual(len(runs), 3)
+            for run in runs:
+                self.assertTrue(np.all(run == events))
+
+    def test_example_log(self):
+        data = load_log_events(info.example_log_file)
+        choice_data, rows_read = parse_log_choices(data, get_log_keys('nr')[0])
+        self.assertEqual(choice_data.shape[0], 63, 'There are not 63 decision trials')
+        self.assertEqual(len(rows_read), 63)
+        self.assertTrue(np.all(rows_read > 0), 'Each trial should read at least its start & end rows')
+        self.assertLessEqual(np.sum(rows_read), len(data), 'Read more rows than are in the log')
+        self.assertTrue(np.all(np.diff(choice_data['onset']) > 0), 'Onsets are not increasing')
+        self.assertTrue(np.all(np.isin(choice_data['decision'], [-1, 0, 1])))
+        self.assertTrue(np.all(choice_data['button_press'][choice_data['presses_found'] == 0] == 0))
+
+    def test_presses_and_conflicts(self):
+
+        opts  = info.decision_trials[['cogent_opt1', 'cogent_opt2']].values.astype(int)
+        t_con = 5 + np.where(opts[5:,0] != opts[5:,1])[0][0]
+        presses = {0: [('29', 500)],                          # single press
+                   1: [('30', 12500), ('99', 600)],           # late press & wrong key
+                   2: [('29', 500), ('29', 900)],             # repeat press, no conflict
+                   t_con: [('30', 700), ('29', 1200)]}        # conflicting presses
+        choice_data, rows_read = parse_log_choices(fake_log_events(presses), self.keys)
+
+        self.assertEqual(choice_data.loc[0, 'presses_found'], 1)
+        self.assertTrue(np.isnan(choice_data.loc[0, 'presses_conflict']))
+        self.assertEqual(choice_data.loc[0, 'decision'], opts[0, 0])
+        self.assertAlmostEqual(choice_data.loc[0, 'reaction_time'], 0.5)
+
+        self.assertEqual(choice_data.loc[1, 'presses_found'], 0, 'Presses outside of the window or with other keys should not count')
+        self.assertEqual(choice_data.loc[1, 'decision'], 0)
+
+        self.assertEqual(choice_data.loc[2, 'presses_found'], 2)
+        self.assertEqual(choice_data.loc[2, 'presses_conflict'], 0)
+
+        # decision from the first press, button & rt from the latest
+        self.assertEqual(choice_data.loc[t_con, 'presses_conflict'], 1)
+        self.assertEqual(choice_data.loc[t_con, 'decision'], opts[t_con, 1])
+        self.assertEqual(choice_data.loc[t_con, 'button_press'], 1)
+        self.assertAlmostEqual(choice_data.loc[t_con, 'reaction_time'], 1.2)
+
+        self.assertEqual(rows_read[0], 6, 'Rows read for the first trial is off') # pic, slide & press rows
+        self.assertEqual(rows_read[3], 2)
+        self.assertAlmostEqual(choice_data.loc[0, 'onset'], 9.0)
+
+    def test_example_log_timing(self):
+        timing_df = parse_log_timing(load_log_events(info.example_log_file))
+        self.assertEqual(timing_df.shape[0], info.task.shape[0])
+        self.assertEqual(timing_df['onset'][0], 0.0)
+        self.assertEqual(np.sum(timing_df['duration'] > 11), 63)
+
+    def test_parse_logs_isolates_errors(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for sub_id in ['90001', '90002']:
+                shutil.copy(info.example_log_file, f'{tmp_dir}/snt_{sub_id}.log')
+            with open(f'{tmp_dir}/snt_90003.log', 'w') as f:
+                f.write('not a cogent log')
+
+            for n_jobs in [1, 2]:
+                manifest = parse_logs(tmp_dir, 'nr', output_timing=False, out_dir=f'{tmp_dir}/out{n_jobs}', n_jobs=n_jobs)
+                self.assertListEqual(manifest['sub_id'].tolist(), ['90001', '90002', '90003'])
+                self.assertListEqual(manifest['error'].isnull().tolist(), [True, True, False])
+                self.assertTrue(Path(manifest['out_fname'][0]).exists())
+                self.assertTrue(np.all(manifest['duration'] > 0))
+
+    def test_bids_events(self):
+        events_df = log_to_bids_events(info.example_log_file, 'nr', behavior_cols=['affil_coord', 'power_coord'])
+        self.assertListEqual(events_df.columns[:3].tolist(), ['onset', 'duration', 'trial_type'])
+        self.assertEqual(events_df.shape[0], info.task.shape[0])
+        decisions = events_df[events_df['trial_type'] == 'Decision']
+        self.assertListEqual(decisions['decision_num'].tolist(), list(range(1, 64)))
+        self.assertTrue(events_df['decision_num'][events_df['trial_type'] != 'Decision'].isnull().all())
+        self.assertTrue(decisions['response_time'][decisions['button_press'] == 0].isnull().all())
+        self.assertFalse(decisions['affil_coord'].isnull().any())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shutil.copy(info.example_log_file, f'{tmp_dir}/snt_90001.log')
+            manifest = logs_to_bids_events(tmp_dir, 'nr', out_dir=f'{tmp_dir}/bids', n_jobs=1)
+            self.assertTrue(manifest['error'].isnull().all())
+            self.assertTrue(manifest['out_fname'][0].endswith('sub-90001/func/sub-90001_task-snt_events.tsv'))
+            with open(manifest['out_fname'][0], 'r') as f:
+                rows = f.read().splitlines()
+            self.assertEqual(len(rows), info.task.shape[0] + 1)
+            self.assertIn('n/a', rows[1].split('\t'))
+
+
+if __name__ == '__main__':
+    unittest.main()
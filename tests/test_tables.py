@@ -0,0 +1,67 @@
+import unittest
+import sys, tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import warnings
+warnings.filterwarnings("ignore")
+
+# my modules
+curr_dir = str(Path(__file__).parent.absolute())
+sys.path.append(str(Path(f'{curr_dir}/../social_navigation_analysis')))
+import info, utils
+from preprocess import parse_log, load_data
+
+
+class TestTables(unittest.TestCase):
+
+    df = pd.DataFrame({'dimension': pd.Categorical(['affil', 'power', 'neutral']),
+                       'decision': np.array([1, -1, 0], dtype='int8'),
+                       'reaction_time': [1.5, np.nan, 0.25],
+                       'slide_num': ['slide_4', 'slide_5', 'slide_6']},
+                      index=['s1', 's2', 's3'])
+
+    def test_lossless_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for fmt in ['parquet', 'npz']:
+                out_fname = utils.write_table(self.df, f'{tmp_dir}/table.xlsx', fmt=fmt, index=True)
+                self.assertEqual(Path(out_fname).suffix, f'.{fmt}')
+                pd.testing.assert_frame_equal(utils.read_table(out_fname), self.df)
+
+    def test_npz_without_pickles(self):
+        # strings are saved as unicode, w/ their missing values, so the file loads w/o unpickling
+        df = self.df.assign(slide_num=['slide_4', np.nan, 'slide_6'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_fname = utils.write_table(df, f'{tmp_dir}/table', fmt='npz', index=True)
+            with np.load(out_fname, allow_pickle=False) as arrays:
+                self.assertFalse(any(arrays[name].dtype == object for name in arrays.files))
+            pd.testing.assert_frame_equal(utils.read_table(out_fname), df)
+
+    def test_all_formats_read_back(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for fmt in utils.table_formats:
+                out = utils.read_table(utils.write_table(self.df, f'{tmp_dir}/table', fmt=fmt))
+                self.assertListEqual(out['slide_num'].tolist(), self.df['slide_num'].tolist())
+                np.testing.assert_array_equal(out['decision'], self.df['decision'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(Exception):
+            utils.write_table(self.df, 'table', fmt='pickle')
+        with self.assertRaises(Exception):
+            utils.read_table('table.txt')
+
+    def test_parse_log_formats(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dfs = []
+            for fmt in ['xlsx', 'parquet']:
+                out_fname = parse_log(info.example_log_file, 'nr', out_dir=f'{tmp_dir}/{fmt}', fmt=fmt)
+                self.assertTrue(out_fname.endswith(f'.{fmt}'))
+                self.assertTrue(Path(f'{tmp_dir}/{fmt}/Timing/SNT_18001_timing.{fmt}').exists())
+                sub_id, data = load_data(out_fname)
+                self.assertEqual(sub_id, '18001')
+                dfs.append(data)
+            pd.testing.assert_frame_equal(dfs[0], dfs[1], check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()